@@ -0,0 +1,68 @@
+# bench_1_1.py - Бенчмарк пакетного расчёта формулы (1.1)
+
+# Запуск из корня проекта: python -m benchmarks.bench_1_1 [--max-rows 10000000]
+
+import argparse
+import time
+
+import numpy as np
+
+from formulas import calculate_1_1, calculate_1_1_batch
+
+
+def make_inputs(n_rows, n_fuels=80, n_sites=50, seed=0):
+    """Синтетические записи расхода топлива: FC, EF, OF, топливо и площадка"""
+    rng = np.random.default_rng(seed)
+    return {
+        "fc": rng.uniform(0.0, 1000.0, n_rows),
+        "ef": rng.uniform(1.3, 3.2, n_rows),
+        "of_val": rng.choice([0.98, 1.0], n_rows),
+        "fuels": rng.integers(0, n_fuels, n_rows),
+        "sites": rng.integers(0, n_sites, n_rows),
+    }
+
+
+def best_of(func, repeat):
+    """Лучшее время из repeat запусков, с"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк формулы (1.1)")
+    parser.add_argument("--max-rows", type=int, default=10**7)
+    parser.add_argument("--scalar-max-rows", type=int, default=10**6)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'строк':>10} {'scalar, с':>12} {'batch, с':>10} {'batch+группы, с':>16}")
+    n_rows = 10**3
+    while n_rows <= args.max_rows:
+        data = make_inputs(n_rows)
+        batch = calculate_1_1_batch(data["fc"], data["ef"], data["of_val"])
+        scalar_time = "-"
+        if n_rows <= args.scalar_max_rows:
+            lists = [data[k].tolist() for k in ("fc", "ef", "of_val")]
+            expected = calculate_1_1(*lists)
+            if not np.isclose(batch["total"], expected, rtol=1e-12):
+                raise SystemExit(
+                    f"Расхождение для {n_rows} строк: {batch['total']} != {expected}"
+                )
+            scalar_time = f"{best_of(lambda: calculate_1_1(*lists), args.repeat):.4f}"
+        batch_time = best_of(
+            lambda: calculate_1_1_batch(data["fc"], data["ef"], data["of_val"]),
+            args.repeat,
+        )
+        grouped_time = best_of(lambda: calculate_1_1_batch(**data), args.repeat)
+        print(
+            f"{n_rows:>10} {scalar_time:>12} {batch_time:>10.4f} {grouped_time:>16.4f}"
+        )
+        n_rows *= 10
+
+
+if __name__ == "__main__":
+    main()
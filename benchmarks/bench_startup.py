@@ -0,0 +1,90 @@
+# bench_startup.py - Замер времени запуска: импорт модулей и показ первого окна
+
+# Запуск из корня проекта: python -m benchmarks.bench_startup [--top 15]
+# Каждый замер выполняется в новом процессе интерпретатора (холодный импорт).
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_MODULES = ["data_tables", "formulas", "latex_cache", "custom", "ui", "cli"]
+
+FIRST_WINDOW_SCRIPT = """
+import time
+start = time.perf_counter()
+from ttkthemes import ThemedTk
+from ui import GHGCalculator
+root = ThemedTk(theme="arc")
+app = GHGCalculator(root)
+root.update()
+print(time.perf_counter() - start)
+root.destroy()
+"""
+
+
+def import_times(module):
+    """
+    Время импорта модуля в отдельном процессе по данным python -X importtime
+    Возвращает: список (модуль, собственное время мкс, накопленное время мкс)
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        rows.append((name.strip(), int(own), int(cumulative)))
+    return rows
+
+
+def first_window_time():
+    """Время от запуска до отрисовки главного окна, с (None без дисплея)"""
+    proc = subprocess.run(
+        [sys.executable, "-c", FIRST_WINDOW_SCRIPT],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return None
+    return float(proc.stdout.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк запуска приложения")
+    parser.add_argument(
+        "--top", type=int, default=10, help="Самых медленных зависимостей на модуль"
+    )
+    args = parser.parse_args()
+
+    for module in APP_MODULES:
+        try:
+            rows = import_times(module)
+        except RuntimeError as e:
+            print(f"{module}: ошибка импорта ({e})")
+            continue
+        total = next(c for name, _, c in reversed(rows) if name == module)
+        print(f"{module}: {total / 1000:.1f} мс")
+        top_level = [r for r in rows if r[0].split(".")[0] != module]
+        heaviest = sorted(top_level, key=lambda r: r[2], reverse=True)[: args.top]
+        for name, _, cumulative in heaviest:
+            print(f"    {name:<40} {cumulative / 1000:8.1f} мс")
+
+    elapsed = first_window_time()
+    if elapsed is None:
+        print("Первое окно: не измерено (нет дисплея или ttkthemes)")
+    else:
+        print(f"Первое окно: {elapsed:.3f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+# suite.py - Набор бенчмарков: формулы, таблицы коэффициентов, LaTeX, кастомные формулы
+
+# Запуск из корня проекта:
+#   python -m benchmarks.suite -o bench.json
+#   python -m benchmarks.suite -o new.json --baseline bench.json --threshold 0.2
+# Входные данные синтетические с фиксированным seed, поэтому запуски сравнимы.
+# Для каждого случая и размера сохраняется лучшее время из нескольких запусков;
+# при сравнении с базовым файлом замедление больше порога считается регрессией
+# (код выхода 1).
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_1_1 import best_of
+from data_tables import TABLE_1_1
+from formulas import (
+    CATEGORIES,
+    calculate_1_1_batch,
+    calculate_1_3_batch,
+    calculate_1_4_batch,
+)
+from fuel_table import FUEL_TABLE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = (100, 10000, 1000000)
+SEED = 0
+COMPONENTS = 8  # Компонентов в списках формул (1.3), (1.4)
+
+# Диапазоны синтетических значений аргументов формул по именам параметров
+RANGES = {
+    "fc_list": (0.0, 1000.0),
+    "ef_list": (1.3, 3.2),
+    "of_list": (0.98, 1.0),
+    "fc_prime": (0.0, 1000.0),
+    "k": (0.5, 1.5),
+    "ncv": (10.0, 50.0),
+    "w_list": (0.0, 20.0),
+    "n_c_list": (1.0, 4.0),
+    "m_list": (16.0, 58.0),
+    "rho": (0.7, 2.0),
+    "w_c": (0.5, 0.9),
+    "a": (5.0, 15.0),
+    "v": (1.0, 40.0),
+    "s": (0.0, 3.0),
+    "ef": (1.3, 3.2),
+    "q4": (0.0, 5.0),
+    "cc_a": (0.01, 0.1),
+    "cc_f": (0.5, 0.9),
+}
+
+
+class Skip(Exception):
+    """Случай нельзя выполнить в этом окружении (например, нет дисплея)"""
+
+
+# Освобождение ресурсов подготовленного случая (временные каталоги, окна Tk);
+# выполняется в run_suite после его замеров, в обратном порядке
+CLEANUPS = []
+
+
+def on_cleanup(function, *args):
+    """Регистрация освобождения ресурса случая"""
+    CLEANUPS.append((function, args))
+
+
+def temp_dir(prefix):
+    """Временный каталог для данных случая (удаляется в run_suite)"""
+    path = tempfile.mkdtemp(prefix=prefix)
+    on_cleanup(shutil.rmtree, path, True)
+    return path
+
+
+def cleanup():
+    while CLEANUPS:
+        function, args = CLEANUPS.pop()
+        function(*args)
+
+
+def formula_params(function):
+    return list(inspect.signature(function).parameters)
+
+
+def synthetic(rng, name, shape):
+    low, high = RANGES.get(name, (0.1, 1.0))
+    return rng.uniform(low, high, shape)
+
+
+def scalar_case(key, function):
+    """Вызов формулы для каждой записи по отдельности (как в интерфейсе)"""
+    params = formula_params(function)
+
+    def setup(size, rng):
+        if key == "(1.1)":
+            # Сумма по size видам топлива одним вызовом со списками
+            args = [synthetic(rng, p, size).tolist() for p in params]
+            return lambda: function(*args)
+        columns = []
+        for p in params:
+            if p.endswith("_list"):
+                columns.append(synthetic(rng, p, (size, COMPONENTS)).tolist())
+            else:
+                columns.append(synthetic(rng, p, size).tolist())
+        rows = list(zip(*columns))
+        return lambda: [function(*row) for row in rows]
+
+    return setup
+
+
+def compositions(rng, size):
+    """Составы газа проб x COMPONENTS с суммой долей 100 %"""
+    w = synthetic(rng, "w_list", (size, COMPONENTS))
+    return w * (100.0 / w.sum(axis=1, keepdims=True))
+
+
+def batch_case(key, function):
+    """Один вызов для массивов всех записей; None, если формула их не принимает"""
+    params = formula_params(function)
+    if key == "(1.1)":
+        function = calculate_1_1_batch
+    elif key in ("(1.3)", "(1.4)"):
+        # Матрица составов проб и векторы свойств компонентов
+        function = {"(1.3)": calculate_1_3_batch, "(1.4)": calculate_1_4_batch}[key]
+
+        def setup(size, rng):
+            args = [
+                (
+                    compositions(rng, size)
+                    if p == "w_list"
+                    else synthetic(rng, p, COMPONENTS if p.endswith("_list") else size)
+                )
+                for p in params
+            ]
+            return lambda: function(*args)
+
+        return setup
+    elif any(p.endswith("_list") for p in params):
+        return None
+
+    def setup(size, rng):
+        args = [synthetic(rng, p, size) for p in params]
+        return lambda: function(*args)
+
+    return setup
+
+
+def fuel_names(size, rng):
+    names = np.asarray(FUEL_TABLE.names, dtype=object)
+    return names[rng.integers(0, len(names), size)]
+
+
+def table_dict_case(size, rng):
+    names = fuel_names(size, rng).tolist()
+    return lambda: [TABLE_1_1[name]["EF"] for name in names]
+
+
+def fuel_table_case(size, rng):
+    names = fuel_names(size, rng)
+    return lambda: FUEL_TABLE.gather("EF", FUEL_TABLE.fuel_ids(names))
+
+
+def coefficient_store_case(size, rng):
+    from coefficient_store import CURRENT_VERSION, CoefficientStore
+
+    store = CoefficientStore(temp_dir("bench-coef-")).ensure_current()
+    names = fuel_names(size, rng)
+    years = np.full(size, int(CURRENT_VERSION))
+    return lambda: store.resolve("TABLE_1_1", "EF", names, years)
+
+
+def latex_items(size):
+    # Разные выражения, чтобы каждый рендер был промахом кэша
+    return [
+        (rf"E_{{{i}}} = FC_{{{i}}} \cdot EF_{{{i}}}", (2, 0.5)) for i in range(size)
+    ]
+
+
+def latex_render_case(size, rng):
+    from latex_cache import render_latex_png
+
+    items = latex_items(size)
+    return lambda: [render_latex_png(latex, item_size) for latex, item_size in items]
+
+
+def latex_disk_case(size, rng):
+    from latex_cache import LatexCache
+
+    cache = LatexCache(temp_dir("bench-latex-"))
+    items = latex_items(size)
+    for latex, item_size in items:
+        cache.get_png(latex, item_size)
+
+    def run():
+        # Новый экземпляр - без PhotoImage в памяти, только чтение с диска
+        disk = LatexCache(cache.cache_dir)
+        return [disk.get_png(latex, item_size) for latex, item_size in items]
+
+    return run
+
+
+def latex_label_case(size, rng):
+    """Создание метки как в GHGCalculator.create_latex_label (нужен дисплей)"""
+    import tkinter as tk
+    from tkinter import ttk
+
+    from latex_cache import LatexCache
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise Skip(f"нет дисплея: {e}")
+    on_cleanup(root.destroy)
+    root.withdraw()
+    cache = LatexCache(temp_dir("bench-latex-"))
+    items = latex_items(size)
+    for latex, item_size in items:
+        cache.get_png(latex, item_size)
+
+    def run():
+        labels = []
+        for latex, item_size in items:
+            photo = cache.get_photo(latex, item_size)
+            label = ttk.Label(root, image=photo)
+            label.image = photo
+            labels.append(label)
+        for label in labels:
+            label.destroy()
+
+    return run
+
+
+CUSTOM_FORMULA = "FC * EF * OF + CH4 * 28"
+CUSTOM_VARS = ("FC", "EF", "OF", "CH4")
+
+
+def custom_compile_case(size, rng):
+    from custom import _compile_normalized, compile_formula
+
+    texts = [f"{CUSTOM_FORMULA} + {i}" for i in range(size)]
+
+    def run():
+        _compile_normalized.cache_clear()
+        return [compile_formula(text) for text in texts]
+
+    return run
+
+
+def custom_scalar_case(size, rng):
+    from custom import evaluate_formula
+
+    rows = [
+        {name: float(v) for name, v in zip(CUSTOM_VARS, values)}
+        for values in rng.uniform(0.1, 2.0, (size, len(CUSTOM_VARS)))
+    ]
+    return lambda: [evaluate_formula(CUSTOM_FORMULA, row) for row in rows]
+
+
+def custom_table_case(size, rng):
+    from custom import evaluate_table
+
+    columns = {name: rng.uniform(0.1, 2.0, size) for name in CUSTOM_VARS}
+    return lambda: evaluate_table(CUSTOM_FORMULA, columns, workers=1)
+
+
+def build_cases():
+    """
+    Случаи бенчмарка: имя -> (setup(size, rng) -> функция, наибольший размер)
+    Наибольший размер ограничивает медленные построчные случаи
+    """
+    cases = {}
+    for formulas_by_key in CATEGORIES.values():
+        for key, formula in formulas_by_key.items():
+            function = formula["function"]
+            scalar_max = None if key == "(1.1)" else 100000
+            cases[f"formula{key}.scalar"] = (scalar_case(key, function), scalar_max)
+            batch = batch_case(key, function)
+            if batch is not None:
+                cases[f"formula{key}.batch"] = (batch, None)
+    cases["table_1_1.dict"] = (table_dict_case, None)
+    cases["table_1_1.fuel_table"] = (fuel_table_case, None)
+    cases["table_1_1.coefficient_store"] = (coefficient_store_case, None)
+    cases["latex.render"] = (latex_render_case, 10)
+    cases["latex.disk"] = (latex_disk_case, 100)
+    cases["latex.label"] = (latex_label_case, 100)
+    cases["custom.compile"] = (custom_compile_case, 100)
+    cases["custom.evaluate_formula"] = (custom_scalar_case, 100000)
+    cases["custom.evaluate_table"] = (custom_table_case, None)
+    return cases
+
+
+def environment():
+    """Сведения об окружении для сравнения запусков"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    versions = {"numpy": np.__version__}
+    for module in ("matplotlib", "sympy"):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": versions,
+    }
+
+
+def run_suite(sizes, repeat, only=None):
+    results = []
+    for name, (setup, max_size) in build_cases().items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        if max_size is not None:
+            # Медленные случаи выполняются не больше чем на max_size записях
+            case_sizes = sorted({min(size, max_size) for size in sizes})
+        else:
+            case_sizes = sizes
+        for size in case_sizes:
+            rng = np.random.default_rng(SEED)
+            entry = {"case": name, "size": size}
+            try:
+                function = setup(size, rng)
+                function()  # Прогрев: кэши, ленивые импорты
+                seconds = best_of(function, repeat)
+            except Skip as e:
+                entry["skipped"] = str(e)
+                print(f"{name:<40} {size:>9}  пропущен: {e}")
+                results.append(entry)
+                break
+            finally:
+                cleanup()
+            entry["seconds"] = seconds
+            entry["per_item_us"] = seconds / size * 1e6
+            results.append(entry)
+            print(
+                f"{name:<40} {size:>9} {seconds:>11.6f} с "
+                f"{entry['per_item_us']:>10.3f} мкс/запись"
+            )
+    return results
+
+
+def compare(results, baseline, threshold, min_delta):
+    """
+    Сравнение с базовым запуском
+    Возвращает: (регрессии, ускорения) - списки (случай, размер, было, стало)
+    """
+    before = {
+        (r["case"], r["size"]): r["seconds"]
+        for r in baseline["results"]
+        if "seconds" in r
+    }
+    regressions, improvements = [], []
+    for r in results:
+        old = before.get((r["case"], r["size"]))
+        if old is None or "seconds" not in r:
+            continue
+        new = r["seconds"]
+        row = (r["case"], r["size"], old, new)
+        if new > old * (1 + threshold) and new - old > min_delta:
+            regressions.append(row)
+        elif new < old / (1 + threshold) and old - new > min_delta:
+            improvements.append(row)
+    return regressions, improvements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Набор бенчмарков GHGCalculator")
+    parser.add_argument("-o", "--output", help="Файл JSON для результатов")
+    parser.add_argument(
+        "--sizes",
+        type=lambda text: [int(float(s)) for s in text.split(",")],
+        default=list(DEFAULT_SIZES),
+        help="Размеры данных через запятую, например 100,1e4,1e6",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--only", nargs="*", help="Только случаи, имена которых содержат подстроки"
+    )
+    parser.add_argument("--baseline", help="Файл JSON предыдущего запуска")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Допустимое относительное замедление (0.2 = 20%%)",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=0.0005,
+        help="Разница времени в секундах, меньше которой изменения не учитываются",
+    )
+    args = parser.parse_args()
+
+    report = {
+        "environment": environment(),
+        "settings": {"sizes": args.sizes, "repeat": args.repeat, "seed": SEED},
+        "results": run_suite(args.sizes, args.repeat, args.only),
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"Результаты сохранены в {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions, improvements = compare(
+            report["results"], baseline, args.threshold, args.min_delta
+        )
+        for title, rows in (("Ускорения", improvements), ("Регрессии", regressions)):
+            if rows:
+                print(f"{title} (порог {args.threshold:.0%}):")
+            for case, size, old, new in rows:
+                print(
+                    f"    {case:<40} {size:>9} {old:.6f} -> {new:.6f} с ({new / old:.2f}x)"
+                )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
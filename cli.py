@@ -0,0 +1,211 @@
+# cli.py - Консольный пакетный расчёт без GUI (без tkinter, ttkthemes и matplotlib)
+
+# Пример: python cli.py inputs.csv -o results.csv
+# Каждая строка входа содержит ключ формулы (поле "formula") и значения аргументов
+# функции формулы по именам, например: formula=(1.2а), fc_prime=120, k=1.129.
+# Списки (для (1.1), (1.3), (1.4)) задаются через ";" в CSV или массивом в JSONL.
+
+import argparse
+import csv
+import inspect
+import json
+import sys
+from functools import lru_cache
+from itertools import islice
+
+import instrumentation
+from formulas import find_formula
+
+LIST_SEPARATOR = ";"
+
+
+def read_rows(stream, fmt):
+    """
+    Построчное чтение входа без загрузки файла в память: генератор словарей
+    (CSV) или строк JSONL, которые разбираются при расчёте строки (decode_row)
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def decode_row(row):
+    """Словарь строки входа; строка JSONL разбирается здесь, ошибки - ValueError"""
+    if not isinstance(row, str):
+        return row
+    try:
+        row = json.loads(row)
+    except ValueError as e:
+        raise ValueError(f"Неверная строка JSONL: {e}")
+    if not isinstance(row, dict):
+        raise ValueError("Строка JSONL должна быть объектом")
+    return row
+
+
+def parse_value(value, as_list=False):
+    """
+    Преобразование значения поля в float или список float
+    - as_list: аргумент-список (*_list); одно значение становится списком из одного
+    """
+    if isinstance(value, list):
+        return [float(x) for x in value]
+    if isinstance(value, str):
+        value = value.strip().replace(",", ".")
+        if LIST_SEPARATOR in value or as_list:
+            return [float(x) for x in value.split(LIST_SEPARATOR) if x.strip()]
+    return [float(value)] if as_list else float(value)
+
+
+@lru_cache(maxsize=None)
+def formula_params(function):
+    """Имена аргументов функции формулы"""
+    return tuple(inspect.signature(function).parameters)
+
+
+def evaluate_row(row):
+    """Расчёт одной строки входа. Возвращает: результат формулы"""
+    formula = find_formula(str(row.get("formula", "")))
+    args = []
+    for name in formula_params(formula["function"]):
+        if row.get(name) in (None, ""):
+            raise ValueError(f"Не задан аргумент {name}")
+        args.append(parse_value(row[name], as_list=name.endswith("_list")))
+    return formula["function"](*args)
+
+
+def process(rows, write, chunk_size=10000, strict=False):
+    """
+    Потоковая обработка строк порциями по chunk_size
+    - rows: итератор словарей входа
+    - write: функция записи порции результатов
+    - strict: прервать обработку на первой ошибке
+    Возвращает: (количество строк, количество ошибок)
+    """
+    total = errors = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return total, errors
+        results = []
+        for row in chunk:
+            total += 1
+            try:
+                row = decode_row(row)
+                results.append((total, row, evaluate_row(row), ""))
+            except (ValueError, TypeError, ArithmeticError) as e:
+                # ArithmeticError - например, деление на M_i = 0 в (1.4)
+                if strict:
+                    # Уже рассчитанные строки порции записываются до остановки
+                    write(results)
+                    raise ValueError(f"Строка {total}: {e}")
+                errors += 1
+                if not isinstance(row, dict):
+                    row = {"input": row}  # Неразобранная строка JSONL
+                results.append((total, row, None, str(e)))
+        write(results)
+
+
+def make_writer(stream, fmt):
+    """Функция записи порции результатов в CSV или JSONL"""
+    if fmt == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(["row", "formula", "result", "error"])
+
+        def write(results):
+            writer.writerows(
+                (n, row.get("formula", ""), "" if res is None else res, err)
+                for n, row, res, err in results
+            )
+            stream.flush()
+
+    else:
+
+        def write(results):
+            for n, row, res, err in results:
+                out = dict(row, row=n, result=res)
+                if err:
+                    out["error"] = err
+                stream.write(json.dumps(out, ensure_ascii=False) + "\n")
+            stream.flush()
+
+    return write
+
+
+def detect_format(path, fmt):
+    if fmt:
+        return fmt
+    return "jsonl" if path.endswith((".jsonl", ".json", ".ndjson")) else "csv"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Пакетный расчёт выбросов по формулам без графического интерфейса"
+    )
+    parser.add_argument("input", help="Входной файл CSV или JSONL ('-' - stdin)")
+    parser.add_argument("-o", "--output", default="-", help="Файл результатов")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    parser.add_argument("--output-format", choices=["csv", "jsonl"])
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument(
+        "--strict", action="store_true", help="Остановиться на первой ошибке"
+    )
+    parser.add_argument(
+        "--metrics", help="Файл метрик вызовов формул и выборок (JSON или CSV)"
+    )
+    parser.add_argument(
+        "--profile", help="Файл профиля прогона (.prof для cProfile или текст)"
+    )
+    parser.add_argument(
+        "--profile-mode", choices=instrumentation.Profiler.MODES, default="cprofile"
+    )
+    args = parser.parse_args(argv)
+
+    in_fmt = detect_format(args.input, args.input_format)
+    out_fmt = detect_format(args.output, args.output_format)
+    fin = (
+        sys.stdin
+        if args.input == "-"
+        else open(args.input, newline="", encoding="utf-8")
+    )
+    fout = (
+        sys.stdout
+        if args.output == "-"
+        else open(args.output, "w", newline="", encoding="utf-8")
+    )
+    if args.metrics:
+        instrumentation.enable()
+    profiler = (
+        instrumentation.Profiler(args.profile_mode).start() if args.profile else None
+    )
+    try:
+        total, errors = process(
+            read_rows(fin, in_fmt),
+            make_writer(fout, out_fmt),
+            chunk_size=args.chunk_size,
+            strict=args.strict,
+        )
+    except ValueError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.dump(args.profile)
+        if args.metrics:
+            instrumentation.disable()
+            instrumentation.METRICS.export(args.metrics)
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+    print(f"Обработано строк: {total}, ошибок: {errors}", file=sys.stderr)
+    return 0 if errors == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+# coefficient_store.py - Версионированное хранилище коэффициентов в бинарном виде (memory-map)
+
+# Каждая версия методики - каталог <root>/<версия> с файлами .npy (структурированные
+# массивы по одной таблице) и index.json (названия строк и полей). Файлы .npy
+# открываются через np.load(mmap_mode="r"): открытие занимает постоянное время,
+# данные читаются с диска по мере обращения без копирования в объекты Python.
+# Версия называется годом вступления методики в силу; для отчётного года
+# используется последняя версия, вступившая в силу не позже него.
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+import data_tables
+
+STORE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "ghgcalculator", "coefficients"
+)
+
+# Версия методики, соответствующая таблицам в data_tables.py (Приказ 371, 2022)
+CURRENT_VERSION = "2022"
+
+TABLE_NAMES = (
+    "TABLE_1_1",
+    "TABLE_1_2",
+    "TABLE_2_1",
+    "TABLE_2_2",
+    "TABLE_3_1",
+    "GWP",
+    "EF_CARBONATES_6_1",
+    "EF_CARBONATES_8_1",
+)
+
+
+def current_tables():
+    """Таблицы текущей версии методики из data_tables.py"""
+    return {name: getattr(data_tables, name) for name in TABLE_NAMES}
+
+
+def table_to_array(table):
+    """
+    Преобразование таблицы-словаря в структурированный массив
+    - table: {название: число} или {название: {поле: число или строка}}
+    Возвращает: (названия строк, структурированный массив)
+    """
+    names = list(table)
+    rows = [table[name] for name in names]
+    if rows and not isinstance(rows[0], dict):
+        rows = [{"value": value} for value in rows]
+    fields = list(rows[0]) if rows else ["value"]
+    dtype = []
+    for field in fields:
+        column = [row[field] for row in rows]
+        if all(isinstance(v, (int, float)) for v in column):
+            dtype.append((field, np.float64))
+        else:
+            width = max(len(str(v)) for v in column)
+            dtype.append((field, f"U{width}"))
+    array = np.array([tuple(row[f] for f in fields) for row in rows], dtype=dtype)
+    return names, array
+
+
+def build_version(version, tables, root=STORE_DIR):
+    """
+    Запись версии методики в хранилище (заменяет существующую)
+    - version: название версии (год вступления в силу)
+    - tables: словарь {имя таблицы: таблица-словарь}, как в data_tables.py
+    """
+    final_dir = os.path.join(root, str(version))
+    tmp_dir = f"{final_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    index = {}
+    for name, table in tables.items():
+        row_names, array = table_to_array(table)
+        # Формат 3.0 - заголовок в UTF-8 (названия полей на кириллице)
+        with open(os.path.join(tmp_dir, f"{name}.npy"), "wb") as f:
+            np.lib.format.write_array(f, array, version=(3, 0))
+        index[name] = row_names
+    with open(os.path.join(tmp_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+    return final_dir
+
+
+class StoredTable:
+    """Таблица одной версии: названия строк и структурированный массив в memory-map"""
+
+    def __init__(self, names, data):
+        self.names = names
+        self.ids = {name: i for i, name in enumerate(names)}
+        self.data = data
+
+    def row_ids(self, keys):
+        """Индексы строк для массива названий; -1 для отсутствующих"""
+        keys = np.asarray(keys)
+        get = self.ids.get
+        ids = np.fromiter(
+            (get(key, -1) for key in keys.ravel().tolist()),
+            dtype=np.int64,
+            count=keys.size,
+        )
+        return ids.reshape(keys.shape)
+
+    def column(self, field):
+        """Столбец таблицы (представление над memory-map, без копирования)"""
+        return self.data[field]
+
+    def gather(self, field, ids):
+        ids = np.asarray(ids)
+        if ids.size and ids.min() < 0:
+            raise ValueError(f"Нет строк в таблице для {np.sum(ids < 0)} записей")
+        return self.data[field][ids]
+
+
+class CoefficientStore:
+    """Хранилище коэффициентов по версиям методики; версии открываются лениво"""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self._indexes = {}
+        self._tables = {}
+
+    def versions(self):
+        """Доступные версии по возрастанию"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name
+            for name in os.listdir(self.root)
+            if os.path.isfile(os.path.join(self.root, name, "index.json"))
+        )
+
+    def ensure_current(self):
+        """Создание текущей версии из data_tables.py, если её ещё нет в хранилище"""
+        if CURRENT_VERSION not in self.versions():
+            build_version(CURRENT_VERSION, current_tables(), self.root)
+        return self
+
+    def table(self, version, name):
+        """Таблица name версии version (открывается в memory-map один раз)"""
+        key = (str(version), name)
+        table = self._tables.get(key)
+        if table is None:
+            version_dir = os.path.join(self.root, str(version))
+            index = self._indexes.get(key[0])
+            if index is None:
+                try:
+                    with open(
+                        os.path.join(version_dir, "index.json"), encoding="utf-8"
+                    ) as f:
+                        index = json.load(f)
+                except OSError:
+                    raise ValueError(f"Нет версии методики {version} в хранилище")
+                self._indexes[key[0]] = index
+            if name not in index:
+                raise ValueError(f"Нет таблицы {name} в версии {version}")
+            data = np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode="r")
+            table = StoredTable(index[name], data)
+            self._tables[key] = table
+        return table
+
+    def _version_positions(self, years):
+        versions = self.versions()
+        if not versions:
+            raise ValueError("Хранилище коэффициентов пусто")
+        starts = np.array([int(v) for v in versions])
+        positions = np.searchsorted(starts, np.asarray(years), side="right") - 1
+        if np.any(positions < 0):
+            raise ValueError(f"Нет версии методики ранее {versions[0]} года")
+        return versions, positions
+
+    def version_for_years(self, years):
+        """
+        Версия методики для каждого отчётного года: последняя версия, вступившая
+        в силу не позже года. Возвращает: массив названий версий
+        """
+        versions, positions = self._version_positions(years)
+        return np.asarray(versions)[positions]
+
+    def resolve(self, name, field, keys, years):
+        """
+        Коэффициент для каждой записи пакета по версии методики её отчётного года
+        - name: имя таблицы, например "TABLE_1_1"
+        - field: поле, например "EF" (для таблиц-чисел - "value")
+        - keys: массив названий строк (например, видов топлива)
+        - years: массив отчётных лет той же длины
+        Возвращает: массив значений; открываются только нужные версии
+        """
+        keys = np.asarray(keys, dtype=object)
+        versions, positions = self._version_positions(years)
+        positions = np.broadcast_to(positions, keys.shape)
+        result = None
+        for position in np.flatnonzero(np.bincount(positions.ravel())):
+            mask = positions == position
+            table = self.table(versions[position], name)
+            values = table.gather(field, table.row_ids(keys[mask]))
+            if result is None:
+                result = np.empty(keys.shape, dtype=values.dtype)
+            result[mask] = values
+        return result if result is not None else np.empty(keys.shape)
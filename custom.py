@@ -1,52 +1,548 @@
 # custom.py - Логика кастомных расчетов, экспорта и графиков
-import sympy as sp
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+# sympy импортируется при первом расчёте, чтобы не замедлять запуск приложения
 import csv
+from functools import lru_cache
 from tkinter import messagebox
 
+from result_store import CUSTOM_CATEGORY, ResultStore
+
+
+def normalize_formula(formula_text):
+    """Нормализация текста формулы для ключа кэша (лишние пробелы удаляются)"""
+    return " ".join(formula_text.split())
+
+
+@lru_cache(maxsize=128)
+def _compile_normalized(formula_text):
+    import sympy as sp
+
+    try:
+        expr = sp.sympify(formula_text)
+    except (sp.SympifyError, SyntaxError, TypeError) as e:
+        raise ValueError(f"Ошибка разбора формулы: {e}")
+    if not isinstance(expr, sp.Expr):
+        raise ValueError(f"Формула должна быть выражением: {formula_text}")
+    symbols = sorted(expr.free_symbols, key=lambda symbol: symbol.name)
+    try:
+        function = sp.lambdify(symbols, expr, modules="numpy")
+    except Exception as e:
+        raise ValueError(f"Ошибка компиляции формулы: {e}")
+    return tuple(symbol.name for symbol in symbols), function
+
+
+def compile_formula(formula_text):
+    """
+    Компиляция кастомной формулы в числовую функцию NumPy (sympy.lambdify)
+    - formula_text: текст формулы, например "FC * EF * OF"
+    Возвращает: (имена переменных, функция от них в том же порядке)
+    Результаты кэшируются по нормализованному тексту (LRU на 128 формул),
+    повторные вызовы не выполняют символьных преобразований.
+    """
+    if not formula_text.strip():
+        raise ValueError("Формула не задана")
+    return _compile_normalized(normalize_formula(formula_text))
+
+
+def parse_vars(vars_text):
+    """Разбор строк вида "имя = значение" в словарь {имя: float}"""
+    values = {}
+    for line in vars_text.split("\n"):
+        if "=" in line:
+            name, value = line.split("=", 1)
+            values[name.strip()] = float(value.strip().replace(",", "."))
+    return values
+
+
+def evaluate_formula(formula_text, values):
+    """
+    Расчёт кастомной формулы по словарю значений переменных
+    Возвращает: результат (float)
+    """
+    names, function = compile_formula(formula_text)
+    missing = [name for name in names if name not in values]
+    if missing:
+        raise ValueError(f"Не заданы переменные: {', '.join(missing)}")
+    return float(function(*(values[name] for name in names)))
+
+
+def read_table_columns(path, column_mapping=None, invalid=None, names=None):
+    """
+    Чтение таблицы CSV в столбцы NumPy
+    - path: путь к CSV с заголовком
+    - column_mapping: словарь {переменная формулы: столбец CSV}; переменные без
+      сопоставления берутся из одноимённых столбцов
+    - invalid: необязательный словарь, в который записывается число непустых
+      ячеек, не являющихся числом (заменяются NaN), по именам столбцов
+    - names: читаемые переменные (например, переменные формулы); остальные
+      столбцы не разбираются. По умолчанию - все столбцы и сопоставления
+    Возвращает: словарь {имя: массив float64}
+    """
+    import numpy as np
+
+    column_mapping = column_mapping or {}
+    invalid = {} if invalid is None else invalid
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"Файл {path} пуст (нет строки заголовка)")
+        header = [name.strip() for name in header]
+        positions = {name: i for i, name in enumerate(header)}
+        for var, column in column_mapping.items():
+            if column not in positions:
+                raise ValueError(f"Нет столбца {column} для переменной {var}")
+        wanted = dict(positions)
+        wanted.update({var: positions[col] for var, col in column_mapping.items()})
+        if names is not None:
+            wanted = {name: wanted[name] for name in names if name in wanted}
+        values = {name: [] for name in wanted}
+        for row in reader:
+            for name, i in wanted.items():
+                cell = row[i].strip().replace(",", ".") if i < len(row) else ""
+                try:
+                    values[name].append(float(cell) if cell else float("nan"))
+                except ValueError:
+                    values[name].append(float("nan"))
+                    invalid[name] = invalid.get(name, 0) + 1
+    return {
+        name: np.asarray(column, dtype=np.float64) for name, column in values.items()
+    }
+
+
+def invalid_cells_message(invalid, names):
+    """Сообщение о неверных ячейках столбцов names; пустая строка, если их нет"""
+    counts = [f"{name} - {invalid[name]}" for name in names if invalid.get(name)]
+    if not counts:
+        return ""
+    return f"Неверные значения заменены NaN (столбец - ячеек): {', '.join(counts)}"
+
+
+def _evaluate_columns(formula_text, arrays, n_rows):
+    """Векторизованный расчёт формулы по столбцам (выполняется и в рабочих процессах)"""
+    import numpy as np
+
+    names, function = compile_formula(formula_text)
+    try:
+        result = np.asarray(function(*arrays), dtype=np.float64)
+    except (TypeError, ValueError):
+        # Выражения, не поддерживающие массивы, считаются построчно
+        result = np.fromiter(
+            (float(function(*row)) for row in zip(*arrays)),
+            dtype=np.float64,
+            count=n_rows,
+        )
+    return np.broadcast_to(result, (n_rows,)).copy()
+
+
+def evaluate_table(formula_text, columns, workers=None, shard_size=1000000):
+    """
+    Расчёт кастомной формулы для всей таблицы значений переменных
+    - formula_text: текст формулы
+    - columns: словарь {переменная: массив значений}
+    - workers: число процессов для больших таблиц (None - по числу ЦП, 1 - без пула)
+    - shard_size: размер части таблицы для одного процесса
+    Возвращает: массив результатов по строкам
+    """
+    import numpy as np
+
+    names, _ = compile_formula(formula_text)
+    missing = [name for name in names if name not in columns]
+    if missing:
+        raise ValueError(f"Нет столбцов для переменных: {', '.join(missing)}")
+    arrays = [np.asarray(columns[name], dtype=np.float64) for name in names]
+    lengths = {len(column) for column in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError("Столбцы переменных имеют разную длину")
+    n_rows = lengths.pop() if lengths else 0
+    if workers == 1 or n_rows <= shard_size:
+        return _evaluate_columns(formula_text, arrays, n_rows)
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    bounds = range(0, n_rows, shard_size)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        parts = pool.map(
+            _evaluate_columns,
+            [formula_text] * len(bounds),
+            [[a[i : i + shard_size] for a in arrays] for i in bounds],
+            [min(shard_size, n_rows - i) for i in bounds],
+        )
+        return np.concatenate(list(parts))
+
+
+def table_records(formula_text, columns, results, facility="", period=""):
+    """Записи хранилища результатов для расчёта по таблице: по одной на строку"""
+    names, _ = compile_formula(formula_text)
+    used = [columns[name].tolist() for name in names]
+    for i, output in enumerate(results.tolist()):
+        yield {
+            "category": CUSTOM_CATEGORY,
+            "formula": formula_text,
+            "facility": facility,
+            "period": period,
+            "inputs": {name: column[i] for name, column in zip(names, used)},
+            "output": output,
+        }
+
+
+def _table_job(job, formula_text, path, column_mapping, store, facility, period):
+    """Расчёт по таблице CSV в очереди расчётов: чтение, расчёт и запись результатов"""
+    job.report(0, 3, "чтение таблицы")
+    invalid = {}
+    names = compile_formula(formula_text)[0]
+    columns = read_table_columns(path, column_mapping, invalid, names)
+    warning = invalid_cells_message(invalid, names)
+    rows = len(next(iter(columns.values()), []))
+    # Предупреждение о неверных ячейках сохраняется в сообщениях следующих этапов
+    job.report(1, 3, "; ".join(filter(None, [f"расчёт, строк: {rows}", warning])))
+    results = evaluate_table(formula_text, columns)
+    job.report(2, 3, "; ".join(filter(None, ["запись результатов", warning])))
+    store.add_many(table_records(formula_text, columns, results, facility, period))
+    return results
+
+
+def lttb(values, n_out, x=None):
+    """
+    Прореживание ряда методом LTTB (Largest-Triangle-Three-Buckets) с сохранением
+    формы: из каждой корзины выбирается точка, образующая наибольший треугольник
+    с выбранной точкой предыдущей корзины и средним следующей
+    - values: массив значений
+    - n_out: число точек результата
+    - x: возрастающие абсциссы (по умолчанию - номера точек)
+    Возвращает: массив номеров выбранных точек по возрастанию
+    """
+    import numpy as np
+
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    y = np.nan_to_num(values)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, np.float64)
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    # Границы корзин для точек между первой и последней
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i == n_out - 3:
+            next_x, next_y = x[-1], y[-1]
+        else:
+            count = edges[i + 2] - end
+            next_x = (cum_x[edges[i + 2]] - cum_x[end]) / count
+            next_y = (cum_y[edges[i + 2]] - cum_y[end]) / count
+        area = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+class ResultPlot:
+    """
+    График ряда результатов с постоянным временем обновления
+    - линия создаётся один раз и обновляется через set_data;
+    - ряд длиннее max_points прореживается LTTB для видимого диапазона, при
+      масштабировании диапазон перечитывается с полной детализацией;
+    - пределы осей расширяются с запасом, поэтому новое значение обычно
+      дорисовывается блиттингом без перерисовки осей
+    """
+
+    HEADROOM = 1.25  # Запас пределов осей при расширении
+
+    def __init__(self, ax, canvas, max_points=1000):
+        import numpy as np
+
+        self.ax = ax
+        self.canvas = canvas
+        self.max_points = max_points
+        self.values = np.empty(1024)
+        self.size = 0
+        self.value_range = None  # (min, max) конечных значений ряда
+        self.view_x = np.empty(0)  # Отображаемые (прореженные) точки
+        self.view_y = np.empty(0)
+        self.loaded = False
+        self.background = None
+        self.blit = getattr(canvas, "supports_blit", False)
+        self._setting_limits = False
+
+        (self.line,) = ax.plot([], [], marker="o", markersize=3, animated=self.blit)
+        ax.set_title("Результаты расчётов")
+        ax.set_xlabel("Расчёт #")
+        ax.set_ylabel("т CO2-экв.")
+        ax.set_xlim(0, 10)
+        ax.set_ylim(0, 1)
+        ax.callbacks.connect("xlim_changed", self.on_xlim_changed)
+        if self.blit:
+            canvas.mpl_connect("draw_event", self.on_draw)
+
+    def set_values(self, values):
+        """Замена всего ряда (например, загрузка истории из хранилища)"""
+        import numpy as np
+
+        values = np.asarray(values, dtype=np.float64)
+        self.values = np.empty(max(1024, 2 * len(values)))
+        self.size = 0
+        self.value_range = None
+        self.loaded = True
+        self.append(values)
+        self.fit_limits(force=True)
+        self.load_view()
+
+    def append(self, values):
+        """
+        Добавление значений в конец ряда (амортизированно O(1) на значение).
+        Если виден конец ряда, новые точки добавляются к отображаемым; когда их
+        становится вдвое больше max_points, они прореживаются повторно
+        """
+        import numpy as np
+
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        start, end = self.size, self.size + len(values)
+        if end > len(self.values):
+            grown = np.empty(max(end, 2 * len(self.values)))
+            grown[:start] = self.values[:start]
+            self.values = grown
+        self.values[start:end] = values
+        self.size = end
+
+        finite = values[np.isfinite(values)]
+        if finite.size:
+            low, high = float(finite.min()), float(finite.max())
+            if self.value_range is not None:
+                low = min(low, self.value_range[0])
+                high = max(high, self.value_range[1])
+            self.value_range = (low, high)
+
+        if start == 0 or (self.view_x.size and self.view_x[-1] == start - 1):
+            x = np.arange(start, end, dtype=np.float64)
+            if len(values) > self.max_points:
+                indices = lttb(values, self.max_points)
+                x, values = x[indices], values[indices]
+            self.view_x = np.concatenate((self.view_x, x))
+            self.view_y = np.concatenate((self.view_y, values))
+            if self.view_x.size > 2 * self.max_points:
+                indices = lttb(self.view_y, self.max_points, self.view_x)
+                self.view_x = self.view_x[indices]
+                self.view_y = self.view_y[indices]
+
+    def load_view(self):
+        """Отображаемые точки для видимого диапазона абсцисс с полной детализацией"""
+        import numpy as np
+
+        lo, hi = self.ax.get_xlim()
+        start = max(0, int(np.floor(lo)))
+        stop = self.size if hi >= self.size - 1 else max(start, int(np.ceil(hi)) + 1)
+        values = self.values[start:stop]
+        indices = lttb(values, self.max_points)
+        self.view_x = (indices + start).astype(np.float64)
+        self.view_y = values[indices]
+
+    def fit_limits(self, force=False):
+        """
+        Расширение пределов осей с запасом, если ряд вышел за них
+        Возвращает: True, если пределы изменились (нужна полная перерисовка)
+        """
+        if self.size == 0:
+            return False
+        # Увеличенный пользователем фрагмент истории не сбрасывается новыми точками
+        following = self.view_x.size == 0 or self.view_x[-1] == self.size - 1
+        if not (force or following):
+            return False
+        x_lo, x_hi = self.ax.get_xlim()
+        y_lo, y_hi = self.ax.get_ylim()
+        new_x = (x_lo, x_hi)
+        new_y = (y_lo, y_hi)
+        if force or self.size - 1 > x_hi:
+            new_x = (0, max(10, (self.size - 1) * self.HEADROOM))
+        if self.value_range is not None:
+            v_lo, v_hi = self.value_range
+            if force or v_lo < y_lo or v_hi > y_hi:
+                margin = (v_hi - v_lo) * (self.HEADROOM - 1) or abs(v_hi) * 0.1 or 1.0
+                new_y = (v_lo - margin, v_hi + margin)
+        if (new_x, new_y) == ((x_lo, x_hi), (y_lo, y_hi)):
+            return False
+        self._setting_limits = True
+        try:
+            self.ax.set_xlim(*new_x)
+            self.ax.set_ylim(*new_y)
+        finally:
+            self._setting_limits = False
+        return True
+
+    def update(self):
+        """Обновление линии после добавления значений"""
+        limits_changed = self.fit_limits()
+        self.line.set_data(self.view_x, self.view_y)
+        if limits_changed or not self.blit or self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.line)
+        self.canvas.blit(self.ax.bbox)
+
+    def on_xlim_changed(self, ax):
+        # Масштабирование или сдвиг пользователем: детализация нового диапазона
+        if not self._setting_limits:
+            self.load_view()
+            self.line.set_data(self.view_x, self.view_y)
+
+    def on_draw(self, event):
+        # Фон осей без линии запоминается для блиттинга, затем линия дорисовывается
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.line)
+        self.canvas.blit(self.ax.bbox)
+
 
 class CustomCalculator:
-    def __init__(self, ax, canvas, results):
+    def __init__(self, ax, canvas, store=None, executor=None):
         self.ax = ax
         self.canvas = canvas
-        self.results = results
+        # История результатов (result_store.ResultStore) вместо списка в памяти
+        self.store = store if store is not None else ResultStore()
+        # Очередь расчётов (executor.CalculationExecutor); без неё расчёт синхронный
+        self.executor = executor
+        self.plot = ResultPlot(ax, canvas)
 
-    def calc(self, custom_formula_widget, custom_vars_widget, custom_result_label):
+    def calc(
+        self,
+        custom_formula_widget,
+        custom_vars_widget,
+        custom_result_label,
+        facility="",
+        period="",
+    ):
         try:
             formula_text = custom_formula_widget.get("1.0", "end").strip()
-            vars_text = custom_vars_widget.get("1.0", "end").strip().split("\n")
-            sym_formula = sp.sympify(formula_text)
-            subs = {
-                sp.symbols(k.split("=")[0].strip()): float(k.split("=")[1].strip())
-                for k in vars_text
-                if "=" in k
-            }
-            result = float(sym_formula.subs(subs))
-            custom_result_label.config(text=f"Результат: {result:.2f}")
-            self.results.append(result)
-            self.draw_graph()
+            # Ошибки разбора формулы сообщаются до разбора переменных и расчёта
+            compile_formula(formula_text)
+            values = parse_vars(custom_vars_widget.get("1.0", "end"))
         except Exception as e:
             messagebox.showerror("Ошибка", str(e))
+            return
 
-    def draw_graph(self):
-        self.ax.clear()
-        self.ax.plot(self.results, marker="o")
-        self.ax.set_title("Результаты расчётов")
-        self.ax.set_xlabel("Расчёт #")
-        self.ax.set_ylabel("т CO2-экв.")
-        self.canvas.draw()
+        def done(result):
+            if custom_result_label.winfo_exists():
+                custom_result_label.config(text=f"Результат: {result:.2f}")
+            self.store.add(
+                formula_text,
+                values,
+                result,
+                facility=facility,
+                period=period,
+                category=CUSTOM_CATEGORY,
+            )
+            self.draw_graph([result])
 
-    def export_result(self):
-        if not self.results:
+        if self.executor is not None:
+            return self.executor.submit(
+                evaluate_formula,
+                formula_text,
+                values,
+                name="Кастомная формула",
+                on_done=done,
+                on_error=lambda e: messagebox.showerror("Ошибка", str(e)),
+            )
+        try:
+            done(evaluate_formula(formula_text, values))
+        except Exception as e:
+            messagebox.showerror("Ошибка", str(e))
+
+    def calc_table(
+        self, custom_formula_widget, path, column_mapping=None, facility="", period=""
+    ):
+        """
+        Расчёт кастомной формулы для каждой строки таблицы CSV; результаты
+        записываются в хранилище пакетно
+        Возвращает: массив результатов (None при ошибке); при заданной очереди
+        расчётов - задание (Job), запись выполняется в фоновом потоке
+        """
+        try:
+            formula_text = custom_formula_widget.get("1.0", "end").strip()
+            compile_formula(formula_text)
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e))
+            return None
+
+        if self.executor is not None:
+            return self.executor.submit(
+                _table_job,
+                formula_text,
+                path,
+                column_mapping,
+                self.store,
+                facility,
+                period,
+                name=f"Таблица {path}",
+                with_job=True,
+                on_done=self.draw_graph,
+                on_error=lambda e: messagebox.showerror("Ошибка", str(e)),
+            )
+        invalid = {}
+        names = compile_formula(formula_text)[0]
+        try:
+            columns = read_table_columns(path, column_mapping, invalid, names)
+            results = evaluate_table(formula_text, columns)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Ошибка", str(e))
+            return None
+        self.store.add_many(
+            table_records(formula_text, columns, results, facility, period)
+        )
+        self.draw_graph(results)
+        warning = invalid_cells_message(invalid, names)
+        if warning:
+            messagebox.showwarning("Неверные значения", warning)
+        return results
+
+    def check_formula(self, custom_formula_widget):
+        """Проверка формулы без расчёта (например, при потере фокуса полем ввода)"""
+        try:
+            compile_formula(custom_formula_widget.get("1.0", "end"))
+            return True
+        except ValueError as e:
+            messagebox.showerror("Ошибка в формуле", str(e))
+            return False
+
+    def draw_graph(self, new_values=None):
+        """
+        Обновление графика; new_values - результаты, добавленные после
+        предыдущего обновления (история из хранилища читается один раз)
+        """
+        if not self.plot.loaded:
+            self.plot.set_values(self.store.outputs(category=CUSTOM_CATEGORY))
+        elif new_values is not None:
+            self.plot.append(new_values)
+        self.plot.update()
+
+    def export_result(self, path=None, **filters):
+        """
+        Выгрузка истории результатов в CSV
+        - path: файл; по умолчанию выбирается в диалоге сохранения
+        - filters: условия отбора ResultStore (category, formula, facility, period)
+        """
+        if not self.store.count(**filters):
             messagebox.showinfo("Инфо", "Нет результатов для экспорта")
             return
+        if path is None:
+            from tkinter import filedialog
+
+            path = filedialog.asksaveasfilename(
+                defaultextension=".csv",
+                initialfile="results.csv",
+                filetypes=[("CSV", "*.csv")],
+            )
+            if not path:
+                return
         try:
-            with open("results.csv", "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(["Расчёт", "Значение (т CO2-экв.)"])
-                for i, res in enumerate(self.results, 1):
-                    writer.writerow([i, res])
-            messagebox.showinfo("Успех", "Экспортировано в results.csv")
+            count = self.store.export_csv(path, **filters)
+            messagebox.showinfo("Успех", f"Экспортировано записей: {count} в {path}")
         except Exception as e:
             messagebox.showerror("Ошибка экспорта", str(e))
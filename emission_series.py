@@ -0,0 +1,274 @@
+# emission_series.py - Помесячные ряды выбросов по объектам: скользящие итоги и сравнения периодов
+
+# Для каждого объекта хранятся помесячные выбросы и их накопленные суммы
+# (префиксные суммы по месяцам). Сумма за любое окно месяцев - разность двух
+# накопленных сумм, поэтому скользящий 12-месячный итог или сравнение месяца с
+# предыдущим (или с тем же месяцем прошлого года) вычисляются за O(1) на запрос,
+# а ряд скользящих итогов по всем месяцам - одной операцией над массивом.
+# Новый месяц добавляет один столбец накопленных сумм без пересчёта истории;
+# исправление старого месяца сдвигает накопленные суммы только после него.
+# Месяцы без данных объекта считаются нулевыми, число месяцев с данными в окне
+# возвращает months_reported.
+
+import numpy as np
+
+from rollup import period_labels, period_numbers
+
+
+def month_number(month):
+    """Номер месяца от 1970 года из "2024-01", datetime64, date или номера"""
+    if isinstance(month, (int, np.integer)):
+        return int(month)
+    return int(period_numbers(np.datetime64(month, "M"), "month"))
+
+
+def _check_positive(**counts):
+    """Проверка, что окно (months) и сдвиг (lag) - не меньше одного месяца"""
+    for name, count in counts.items():
+        if count < 1:
+            raise ValueError(f"{name} должно быть не меньше одного месяца: {count}")
+
+
+class EmissionSeries:
+    """
+    Помесячные выбросы объектов с накопленными суммами
+    - capacity: число месяцев, под которое память выделяется заранее
+      (при превышении запас удваивается)
+    """
+
+    def __init__(self, capacity=120):
+        self.facilities = []
+        self.ids = {}  # Объект -> строка массивов
+        self.start = None  # Номер первого месяца истории
+        self.length = 0  # Месяцев в истории
+        self.values = np.zeros((0, capacity))  # Выбросы объекта за месяц
+        self.reported = np.zeros((0, capacity), dtype=bool)
+        # Накопленные суммы: столбец m - сумма за месяцы до m (не включая)
+        self.cumsum = np.zeros((0, capacity + 1))
+        self.cumcount = np.zeros((0, capacity + 1), dtype=np.int64)
+
+    @classmethod
+    def from_totals(cls, facilities, months, emissions):
+        """
+        Ряд по итогам за месяцы (например, из rollup или meter_ingest)
+        - facilities, months, emissions: массивы объекта, месяца ("2024-01",
+          datetime64) и выбросов по записям; записи одного месяца объекта складываются
+        """
+        series = cls()
+        numbers = period_numbers(np.asarray(months, dtype="datetime64[M]"), "month")
+        if not numbers.size:
+            return series
+        series.start = int(numbers.min())
+        series._reserve_months(int(numbers.max()) - series.start + 1)
+        ids = series._facility_ids(facilities)
+        values = np.zeros((len(series.facilities), series.values.shape[1]))
+        reported = np.zeros(values.shape, dtype=bool)
+        np.add.at(values, (ids, numbers - series.start), emissions)
+        reported[ids, numbers - series.start] = True
+        series.length = int(numbers.max()) - series.start + 1
+        series.values, series.reported = values, reported
+        series.cumsum[:, 1:] = np.cumsum(values, axis=1)
+        series.cumcount[:, 1:] = np.cumsum(reported, axis=1)
+        return series
+
+    @classmethod
+    def from_rollup(cls, table, facility="facility", period="period", value="co2e"):
+        """Ряд из уровня rollup (объект, месяц) с подписями месяцев "2024-01" """
+        return cls.from_totals(table[facility], table[period], table[value])
+
+    # Память
+
+    def _reserve_months(self, n_months):
+        capacity = self.values.shape[1]
+        if n_months <= capacity:
+            return
+        capacity = max(n_months, 2 * capacity)
+        self.values = self._resized(self.values, len(self.facilities), capacity)
+        self.reported = self._resized(self.reported, len(self.facilities), capacity)
+        cumsum = self._resized(self.cumsum, len(self.facilities), capacity + 1)
+        cumcount = self._resized(self.cumcount, len(self.facilities), capacity + 1)
+        self.cumsum, self.cumcount = cumsum, cumcount
+
+    @staticmethod
+    def _resized(array, rows, columns):
+        result = np.zeros((rows, columns), dtype=array.dtype)
+        result[: array.shape[0], : array.shape[1]] = array[:, :columns]
+        return result
+
+    def _facility_ids(self, facilities):
+        """Строки объектов (новые объекты добавляются с нулевой историей)"""
+        labels, inverse = np.unique(
+            np.asarray(facilities, dtype=str), return_inverse=True
+        )
+        rows = np.empty(len(labels), dtype=np.int64)
+        for i, label in enumerate(labels.tolist()):
+            if label not in self.ids:
+                self.ids[label] = len(self.facilities)
+                self.facilities.append(label)
+            rows[i] = self.ids[label]
+        n_rows = len(self.facilities)
+        if n_rows > self.values.shape[0]:
+            self.values = self._resized(self.values, n_rows, self.values.shape[1])
+            self.reported = self._resized(self.reported, n_rows, self.reported.shape[1])
+            self.cumsum = self._resized(self.cumsum, n_rows, self.cumsum.shape[1])
+            self.cumcount = self._resized(self.cumcount, n_rows, self.cumcount.shape[1])
+        return rows[inverse.ravel()]
+
+    def _prepend(self, n_months):
+        """Сдвиг истории на n_months вправо (месяц раньше начала истории)"""
+        self._reserve_months(self.length + n_months)
+        for name in ("values", "reported"):
+            array = getattr(self, name)
+            array[:, n_months : self.length + n_months] = array[:, : self.length].copy()
+            array[:, :n_months] = 0
+        self.start -= n_months
+        self.length += n_months
+        self.cumsum[:, 1 : self.length + 1] = np.cumsum(
+            self.values[:, : self.length], axis=1
+        )
+        self.cumcount[:, 1 : self.length + 1] = np.cumsum(
+            self.reported[:, : self.length], axis=1
+        )
+
+    # Обновление
+
+    def add_month(self, month, emissions):
+        """
+        Выбросы объектов за месяц
+        - month: месяц ("2024-01", datetime64 или номер)
+        - emissions: словарь {объект: выбросы} (объекты без значения не меняются)
+        Новый месяц в конце истории - O(число объектов); исправление более
+        раннего месяца пересчитывает накопленные суммы только после него
+        """
+        number = month_number(month)
+        if self.start is None:
+            self.start = number
+        if number < self.start:
+            self._prepend(self.start - number)
+        position = number - self.start
+        if position >= self.length:
+            # Новые месяцы (и пропущенные до них) начинаются с итога истории
+            self._reserve_months(position + 1)
+            for cumulative in (self.cumsum, self.cumcount):
+                cumulative[:, self.length + 1 : position + 2] = cumulative[
+                    :, self.length, np.newaxis
+                ]
+            self.length = position + 1
+        if not emissions:
+            return
+        rows = self._facility_ids(list(emissions))
+        new = np.array(list(emissions.values()), dtype=np.float64)
+        delta = new - self.values[rows, position]
+        added = ~self.reported[rows, position]
+        self.values[rows, position] = new
+        self.reported[rows, position] = True
+        # Для последнего месяца меняется один столбец накопленных сумм
+        self.cumsum[rows, position + 1 : self.length + 1] += delta[:, np.newaxis]
+        self.cumcount[rows, position + 1 : self.length + 1] += added[:, np.newaxis]
+
+    # Запросы
+
+    def months(self):
+        """Подписи месяцев истории ("2024-01", ...)"""
+        if self.start is None:
+            return np.empty(0, dtype="U7")
+        return period_labels(np.arange(self.start, self.start + self.length), "month")
+
+    def _bounds(self, end, months, partial=True):
+        """
+        Столбцы накопленных сумм окна из months месяцев, заканчивающегося end
+        - partial: обрезать окно началом истории; иначе ValueError
+        """
+        if self.start is None:
+            raise ValueError("Ряд выбросов пуст")
+        _check_positive(months=months)
+        last = month_number(end) - self.start
+        if not 0 <= last < self.length:
+            raise ValueError(f"Месяц {end} вне истории ряда")
+        first = last + 1 - months
+        if first < 0 and not partial:
+            raise ValueError(
+                f"Окно из {months} мес. до {period_labels(self.start + last, 'month')} "
+                f"начинается раньше истории ряда ({self.months()[0]})"
+            )
+        return max(first, 0), last + 1
+
+    def _rows(self, facility):
+        if facility is None:
+            return slice(None)
+        try:
+            return self.ids[str(facility)]
+        except KeyError:
+            raise ValueError(f"Нет объекта в ряду выбросов: {facility}")
+
+    def window(self, end, months=12, facility=None, partial=True):
+        """
+        Выбросы за окно из months месяцев, заканчивающееся месяцем end (включая)
+        - partial: окно, начинающееся раньше истории, обрезается её началом
+          (число месяцев окна в истории - window_months); иначе ValueError
+        Возвращает: число для объекта или массив по объектам (facility=None)
+        """
+        first, last = self._bounds(end, months, partial)
+        rows = self._rows(facility)
+        return self.cumsum[rows, last] - self.cumsum[rows, first]
+
+    def window_months(self, end, months=12):
+        """Число месяцев окна (как в window), попадающих в историю ряда"""
+        first, last = self._bounds(end, months)
+        return last - first
+
+    def months_reported(self, end, months=12, facility=None):
+        """Число месяцев с данными в окне (как в window)"""
+        first, last = self._bounds(end, months)
+        rows = self._rows(facility)
+        return self.cumcount[rows, last] - self.cumcount[rows, first]
+
+    def total(self, end, months=12):
+        """Выбросы всех объектов за окно"""
+        return float(np.sum(self.window(end, months)))
+
+    def change(self, end, months=1, lag=1, facility=None):
+        """
+        Сравнение окна, заканчивающегося end, с окном на lag месяцев раньше
+        (months=1, lag=1 - месяц к предыдущему; months=12, lag=12 - скользящий
+        год к предыдущему году)
+        Оба окна должны целиком входить в историю (как в rolling), иначе ValueError
+        Возвращает: словарь current, previous, delta, ratio (NaN при previous = 0)
+        """
+        _check_positive(lag=lag)
+        current = self.window(end, months, facility, partial=False)
+        previous_end = month_number(end) - lag
+        if previous_end < self.start:
+            raise ValueError(f"Нет истории за {lag} мес. до {end}")
+        previous = self.window(previous_end, months, facility, partial=False)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(previous == 0, np.nan, np.divide(current, previous))
+        return {
+            "current": current,
+            "previous": previous,
+            "delta": current - previous,
+            "ratio": ratio if np.ndim(ratio) else float(ratio),
+        }
+
+    def rolling(self, months=12, facility=None):
+        """
+        Скользящие итоги за months месяцев для всех месяцев истории
+        Возвращает: массив (объекты x месяцы или месяцы для объекта); NaN там,
+        где окно начинается раньше истории
+        """
+        _check_positive(months=months)
+        rows = self._rows(facility)
+        cumsum = self.cumsum[rows, : self.length + 1]
+        result = np.full(cumsum.shape[:-1] + (self.length,), np.nan)
+        if months <= self.length:
+            result[..., months - 1 :] = cumsum[..., months:] - cumsum[..., :-months]
+        return result
+
+    def changes(self, months=1, lag=1, facility=None):
+        """Разности скользящих итогов с итогами на lag месяцев раньше по всем месяцам"""
+        _check_positive(lag=lag)
+        totals = self.rolling(months, facility)
+        result = np.full(totals.shape, np.nan)
+        if lag < self.length:
+            result[..., lag:] = totals[..., lag:] - totals[..., :-lag]
+        return result
@@ -0,0 +1,239 @@
+# executor.py - Очередь расчётов в фоновом потоке или процессе с прогрессом и отменой
+
+# Расчёты выполняются по очереди в одном рабочем потоке, поэтому цикл событий Tk
+# не блокируется. Виджеты Tk можно менять только из главного потока: рабочий
+# поток лишь записывает состояние задания, а главный поток опрашивает его через
+# root.after и вызывает обработчики. Задания в потоке отменяются кооперативно
+# (при очередном job.report или job.check); задания в процессе (process=True) -
+# завершением процесса, что подходит для долгих расчётов без точек проверки.
+
+import itertools
+import queue
+import threading
+
+
+class CancelledError(Exception):
+    """Задание отменено пользователем"""
+
+
+class Job:
+    """Задание очереди расчётов; методы report и check вызываются из функции расчёта"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, function, args, kwargs, name, with_job, process):
+        self.id = next(self._ids)
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.name = name or getattr(function, "__name__", "расчёт")
+        self.with_job = with_job
+        self.process = process
+        self.status = "queued"  # queued, running, done, error, cancelled
+        self.progress = None  # (выполнено, всего, сообщение)
+        self.result = None
+        self.error = None
+        self.handlers = {}
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check(self):
+        """Точка отмены: исключение CancelledError, если задание отменено"""
+        if self._cancel.is_set():
+            raise CancelledError(f"Расчёт «{self.name}» отменён")
+
+    def report(self, done, total=None, message=""):
+        """Прогресс расчёта (передаётся в интерфейс при следующем опросе)"""
+        self.progress = (done, total, message)
+        self.check()
+
+
+def _run_in_process(connection, function, args, kwargs):
+    """Выполнение задания в отдельном процессе; результат передаётся через канал"""
+    try:
+        connection.send(("done", function(*args, **kwargs)))
+    except Exception as e:
+        connection.send(("error", e))
+    finally:
+        connection.close()
+
+
+class CalculationExecutor:
+    """
+    Очередь расчётов для интерфейса Tk
+    - root: корневое окно (для опроса через root.after)
+    - poll_interval: период опроса состояния заданий, мс
+    - on_status(executor): вызывается в главном потоке при изменении состояния очереди
+    """
+
+    def __init__(self, root, poll_interval=50, on_status=None):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.on_status = on_status
+        self.pending = queue.Queue()
+        self.finished = queue.Queue()
+        self.jobs = []  # Незавершённые задания в порядке постановки
+        self.current = None
+        self._thread = None
+        self._polling = False
+        self._last_progress = {}
+
+    def submit(
+        self,
+        function,
+        *args,
+        name="",
+        on_done=None,
+        on_error=None,
+        on_progress=None,
+        with_job=False,
+        process=False,
+        **kwargs,
+    ):
+        """
+        Постановка расчёта в очередь
+        - function(*args, **kwargs): функция расчёта; при with_job=True первым
+          аргументом передаётся Job (для report и check)
+        - on_done(result), on_error(exception), on_progress(job): обработчики,
+          вызываются в главном потоке
+        - process: выполнить в отдельном процессе (функция и аргументы должны
+          сериализоваться pickle; прогресс не передаётся)
+        Возвращает: Job
+        """
+        if with_job and process:
+            raise ValueError("Задание в процессе не получает объект Job")
+        job = Job(function, args, kwargs, name, with_job, process)
+        job.handlers = {"done": on_done, "error": on_error, "progress": on_progress}
+        self.jobs.append(job)
+        self.pending.put(job)
+        if self._thread is None:
+            # Рабочий поток создаётся при первом задании и ждёт следующих
+            self._thread = threading.Thread(target=self._work, daemon=True)
+            self._thread.start()
+        self._start_polling()
+        return job
+
+    def cancel(self, job):
+        job.cancel()
+        self._start_polling()
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            job.cancel()
+        self._start_polling()
+
+    @property
+    def busy(self):
+        return bool(self.jobs)
+
+    def status_text(self):
+        """Строка состояния очереди для интерфейса"""
+        job = self.current
+        if job is None:
+            return "Готово" if not self.jobs else f"В очереди: {len(self.jobs)}"
+        text = f"Выполняется: {job.name}"
+        if job.progress is not None:
+            done, total, message = job.progress
+            if total:
+                text += f" {100 * done / total:.0f}%"
+            if message:
+                text += f" ({message})"
+        queued = len(self.jobs) - 1
+        if queued > 0:
+            text += f", в очереди: {queued}"
+        return text
+
+    def _work(self):
+        while True:
+            job = self.pending.get()
+            if job.cancelled:
+                job.status = "cancelled"
+                self.finished.put(job)
+                continue
+            self.current = job
+            job.status = "running"
+            try:
+                if job.process:
+                    job.result = self._run_process(job)
+                elif job.with_job:
+                    job.result = job.function(job, *job.args, **job.kwargs)
+                else:
+                    job.result = job.function(*job.args, **job.kwargs)
+                job.status = "done"
+            except CancelledError:
+                job.status = "cancelled"
+            except Exception as e:
+                job.error = e
+                job.status = "error"
+            self.current = None
+            self.finished.put(job)
+
+    def _run_process(self, job):
+        import multiprocessing
+
+        context = multiprocessing.get_context("spawn")
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_run_in_process,
+            args=(sender, job.function, job.args, job.kwargs),
+            daemon=True,
+        )
+        process.start()
+        sender.close()
+        try:
+            while not receiver.poll(0.1):
+                if job.cancelled:
+                    process.terminate()
+                    job.check()
+                if not process.is_alive() and not receiver.poll():
+                    raise RuntimeError(
+                        f"Процесс расчёта завершился с кодом {process.exitcode}"
+                    )
+            kind, value = receiver.recv()
+        finally:
+            receiver.close()
+            process.join()
+        if kind == "error":
+            raise value
+        return value
+
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        # Главный поток: обработчики завершённых заданий и прогресс текущего.
+        # Опрос продолжается, даже если обработчик завершился с исключением
+        try:
+            self._dispatch()
+        finally:
+            if self.jobs:
+                self.root.after(self.poll_interval, self._poll)
+            else:
+                self._polling = False
+
+    def _dispatch(self):
+        while True:
+            try:
+                job = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            self.jobs.remove(job)
+            self._last_progress.pop(job.id, None)
+            handler = job.handlers.get(job.status)
+            if handler is not None:
+                handler(job.error if job.status == "error" else job.result)
+        job = self.current
+        if job is not None and job.progress != self._last_progress.get(job.id):
+            self._last_progress[job.id] = job.progress
+            if job.handlers.get("progress") is not None:
+                job.handlers["progress"](job)
+        if self.on_status is not None:
+            self.on_status(self)
@@ -0,0 +1,167 @@
+# formula_graph.py - Граф зависимостей формул стационарного сжигания и пакетный расчёт цепочек
+
+# Цепочки (1.6)/(1.7)/(1.10) -> W_C -> (1.5) -> EF -> (1.1) и (1.2а)/(1.2б) -> FC
+# описаны декларативно: каждый узел - формула из CATEGORIES с именованными входами
+# и выходом. Планировщик выбирает узлы, которые можно рассчитать из заданных
+# данных, и вычисляет всю цепочку сразу для массивов по всем видам топлива.
+
+from functools import lru_cache
+
+import numpy as np
+
+from formulas import CATEGORIES, calculate_1_1_batch
+
+STATIONARY = "1. Стационарное сжигание топлива"
+
+# Переменные графа и их обозначения в CATEGORIES
+VARIABLES = {
+    "FC_nat": r"FC'_{j,y}",
+    "k": r"k_{j,y}",
+    "NCV": r"NCV_{j,y}",
+    "FC": r"FC_{j,y}",
+    "A_coke": r"A_{\text{кокс},y}",
+    "V_coke": r"V_{\text{кокс},y}",
+    "S_coke": r"S_{\text{кокс},y}",
+    "A_coal": r"A_{\text{кокс.уголь},y}",
+    "V_coal": r"V_{\text{кокс.уголь},y}",
+    "W_C": r"W_{C,j,y}",
+    "EF": r"EF_{\text{CO}_2,j,y}",
+    "q4": r"q4",
+    "CC_A": r"CC_{A,y}",
+    "CC_F": r"CC_{F,y}",
+    "OF": r"OF_{j,y}",
+    "E": r"FC_{j,y} \cdot EF_{\text{CO}_2,j,y} \cdot OF_{j,y}",
+    "E_CO2": r"E_{\text{CO}_2,y}",
+}
+
+
+def _emissions_by_row(fc, ef, of_val):
+    return calculate_1_1_batch(fc, ef, of_val)["emissions"]
+
+
+# Узлы графа в порядке приоритета для одного выхода: формула, входы (в порядке
+# аргументов функции формулы), выход и, при необходимости, своя функция
+NODES = [
+    {"formula": "(1.2а)", "inputs": ("FC_nat", "k"), "output": "FC"},
+    {"formula": "(1.2б)", "inputs": ("FC_nat", "NCV"), "output": "FC"},
+    {"formula": "(1.6)", "inputs": ("A_coke", "V_coke", "S_coke"), "output": "W_C"},
+    {"formula": "(1.10)", "inputs": ("A_coal", "V_coal"), "output": "W_C"},
+    {"formula": "(1.7)", "inputs": ("EF",), "output": "W_C"},
+    {"formula": "(1.5)", "inputs": ("W_C",), "output": "EF"},
+    {"formula": "(1.8)", "inputs": ("q4",), "output": "OF"},
+    {"formula": "(1.9)", "inputs": ("CC_A", "CC_F"), "output": "OF"},
+    {
+        "formula": "(1.1)",
+        "inputs": ("FC", "EF", "OF"),
+        "output": "E",
+        "function": _emissions_by_row,
+    },
+    {"formula": "(1.1)", "inputs": ("E",), "output": "E_CO2", "function": np.sum},
+]
+
+for _node in NODES:
+    _node.setdefault("function", CATEGORIES[STATIONARY][_node["formula"]]["function"])
+
+PRODUCERS = {}
+for _node in NODES:
+    PRODUCERS.setdefault(_node["output"], []).append(_node)
+
+
+@lru_cache(maxsize=256)
+def plan(targets, available):
+    """
+    Планирование расчёта
+    - targets: кортеж искомых переменных
+    - available: frozenset заданных переменных
+    Возвращает: кортеж шагов (переменная, узлы-источники по приоритету) в порядке
+    расчёта; каждая переменная рассчитывается один раз
+    """
+    steps = []
+    state = {}
+
+    def resolve(name, visiting):
+        """
+        Возвращает: (можно ли рассчитать, окончателен ли ответ); отрицательный
+        ответ, полученный при обрыве цикла, не окончателен - из другой цели
+        переменная может оказаться рассчитываемой
+        """
+        if name in state:
+            return state[name], True
+        if name in visiting:
+            return False, False  # Цикл, например EF -> (1.7) -> W_C -> (1.5) -> EF
+        final = True
+        usable = []
+        for node in PRODUCERS.get(name, ()):
+            for i in node["inputs"]:
+                found, exact = resolve(i, visiting | {name})
+                final = final and exact
+                if not found:
+                    break
+            else:
+                usable.append(node)
+        if usable:
+            steps.append((name, tuple(usable)))
+        found = name in available or bool(usable)
+        # Положительный ответ верен при любом обрыве цикла (и шаг уже добавлен)
+        if found or final:
+            state[name] = found
+        return found, final
+
+    missing = [t for t in targets if not resolve(t, frozenset())[0]]
+    if missing:
+        raise ValueError(
+            f"Недостаточно данных для расчёта: {', '.join(missing)} "
+            f"(заданы: {', '.join(sorted(available)) or 'нет'})"
+        )
+    return tuple(steps)
+
+
+def evaluate_chain(inputs, targets=("E", "E_CO2"), sources=None):
+    """
+    Пакетный расчёт цепочки формул для многих видов топлива сразу
+    - inputs: словарь {переменная графа: число или массив по видам топлива};
+      NaN в массиве означает отсутствие данных для строки - такие строки
+      заполняются следующим по приоритету способом расчёта (смешанные методики)
+    - targets: искомые переменные
+    - sources: необязательный словарь, в который для каждой рассчитанной
+      переменной записывается номер узла-источника по строкам (-1 - задано)
+    Возвращает: словарь всех заданных и рассчитанных переменных (промежуточные
+    результаты рассчитываются один раз и доступны для повторного использования)
+    """
+    unknown = set(inputs) - set(VARIABLES)
+    if unknown:
+        raise ValueError(f"Неизвестные переменные: {', '.join(sorted(unknown))}")
+    names = list(inputs)
+    arrays = np.broadcast_arrays(
+        *(np.asarray(inputs[name], dtype=np.float64) for name in names)
+    )
+    values = dict(zip(names, arrays))
+    for name, nodes in plan(tuple(targets), frozenset(names)):
+        current = values.get(name)
+        source = None
+        if sources is not None:
+            source = np.full(np.shape(arrays[0]) if arrays else (), -1)
+            if current is None:
+                source[...] = 0
+        for position, node in enumerate(nodes):
+            if current is not None and not np.isnan(current).any():
+                break
+            result = node["function"](*(values[i] for i in node["inputs"]))
+            if current is None:
+                current = result
+            else:
+                missing = np.isnan(current)
+                if source is not None:
+                    source[missing & ~np.isnan(result)] = position
+                current = np.where(missing, result, current)
+        values[name] = current
+        if source is not None:
+            sources[name] = source
+    for target in targets:
+        unresolved = np.flatnonzero(np.isnan(values[target]))
+        if unresolved.size:
+            raise ValueError(
+                f"Не удалось рассчитать {target} для строк: "
+                f"{', '.join(map(str, unresolved[:10]))}"
+            )
+    return values
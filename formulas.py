@@ -22,6 +22,68 @@ def calculate_1_1(fc_list, ef_list, of_list):
         raise ValueError(f"Ошибка в расчёте формулы 1.1: {e}")
 
 
+def _group_sums(keys, values):
+    """
+    Суммирование values по группам keys за один проход (np.unique + np.bincount)
+    Возвращает: словарь {ключ: сумма} в порядке сортировки ключей
+    """
+    keys = np.asarray(keys).ravel()
+    if keys.dtype.kind in "iu" and keys.size and 0 <= keys.min() <= keys.max() < 2**20:
+        # Целочисленные идентификаторы (например, индексы топлива) - без сортировки
+        sums = np.bincount(keys, weights=np.ravel(values))
+        present = np.flatnonzero(np.bincount(keys))
+        return {int(label): float(sums[label]) for label in present}
+    labels, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse.ravel(), weights=np.ravel(values), minlength=len(labels))
+    return {label.item(): float(s) for label, s in zip(labels, sums)}
+
+
+def calculate_1_1_batch(fc, ef=None, of_val=None, fuels=None, sites=None):
+    """
+    Пакетный расчёт формулы (1.1) по массивам NumPy за один векторизованный проход
+    - fc: массив FC_j,y или структурированный массив с полями "FC", "EF", "OF"
+      (и необязательными "fuel", "site")
+    - ef: массив EF_CO2,j,y (не указывается для структурированного массива)
+    - of_val: массив OF_j,y (не указывается для структурированного массива)
+    - fuels: необязательный массив видов топлива для промежуточных итогов
+    - sites: необязательный массив площадок для промежуточных итогов
+    Возвращает: словарь {"emissions": выбросы по строкам, "total": E_CO2,y,
+    "by_fuel": {топливо: сумма}, "by_site": {площадка: сумма}} в т CO2
+    """
+    try:
+        fc = np.asarray(fc)
+        if fc.dtype.names:
+            records = fc
+            fc, ef, of_val = records["FC"], records["EF"], records["OF"]
+            if fuels is None and "fuel" in records.dtype.names:
+                fuels = records["fuel"]
+            if sites is None and "site" in records.dtype.names:
+                sites = records["site"]
+        fc = np.ascontiguousarray(fc, dtype=np.float64)
+        ef = np.ascontiguousarray(ef, dtype=np.float64)
+        of_val = np.ascontiguousarray(of_val, dtype=np.float64)
+        if not fc.shape == ef.shape == of_val.shape:
+            raise ValueError(
+                f"размеры массивов FC, EF и OF не совпадают: "
+                f"{fc.shape}, {ef.shape}, {of_val.shape}"
+            )
+        emissions = fc * ef
+        emissions *= of_val
+        result = {
+            "emissions": emissions,
+            "total": float(emissions.sum()),
+            "by_fuel": {},
+            "by_site": {},
+        }
+        if fuels is not None:
+            result["by_fuel"] = _group_sums(fuels, emissions)
+        if sites is not None:
+            result["by_site"] = _group_sums(sites, emissions)
+        return result
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Ошибка в пакетном расчёте формулы 1.1: {e}")
+
+
 def calculate_1_2a(fc_prime, k):
     """
     Расчёт формулы (1.2а): FC_j,y = FC'_j,y * k_j,y
@@ -87,10 +149,108 @@ def calculate_1_4(w_list, n_c_list, m_list, rho):
             w * n_c * 44.011 / m for w, n_c, m in zip(w_list, n_c_list, m_list)
         )
         return sum_term * rho * 0.01
+    except ZeroDivisionError:
+        raise ValueError("Ошибка в расчёте формулы 1.4: M_i не может быть 0")
     except (TypeError, ValueError) as e:
         raise ValueError(f"Ошибка в расчёте формулы 1.4: {e}")
 
 
+# Допустимое отклонение суммы долей компонентов от 100 %
+COMPOSITION_TOLERANCE = 1.0
+
+
+def check_compositions(w, tolerance=COMPOSITION_TOLERANCE):
+    """
+    Проверка составов газа: сумма долей каждой пробы 100 % +- tolerance
+    - w: матрица проб x компонентов, %
+    Возвращает: индексы проб с неверной суммой (или пропусками)
+    """
+    totals = np.asarray(w, dtype=np.float64).sum(axis=-1)
+    return np.flatnonzero(~(np.abs(totals - 100.0) <= tolerance))
+
+
+def _composition_matrix(w, n_components, tolerance):
+    """Матрица долей проб x компонентов с проверкой размеров и сумм"""
+    w = np.asarray(w, dtype=np.float64)
+    if w.ndim == 1:
+        w = w[np.newaxis, :]
+    if w.ndim != 2 or w.shape[1] != n_components:
+        raise ValueError(
+            f"матрица долей {w.shape} не соответствует числу компонентов {n_components}"
+        )
+    if tolerance is not None:
+        bad = check_compositions(w, tolerance)
+        if bad.size:
+            raise ValueError(
+                f"сумма долей компонентов отличается от 100 % в пробах "
+                f"({bad.size}): {', '.join(map(str, bad[:10]))}"
+            )
+    return w
+
+
+def density_for_conditions(conditions, column="rho_CO2"):
+    """
+    Плотность по таблице 1.2 для условий каждой пробы
+    - conditions: название условий из TABLE_1_2 или массив названий по пробам
+    - column: "rho_CO2" или "rho_CH4"
+    Возвращает: массив плотностей, кг/м3
+    """
+    labels, inverse = np.unique(np.asarray(conditions, dtype=str), return_inverse=True)
+    unknown = [label for label in labels.tolist() if label not in TABLE_1_2]
+    if unknown:
+        raise ValueError(f"нет условий в таблице 1.2: {', '.join(unknown)}")
+    values = np.array([TABLE_1_2[label][column] for label in labels.tolist()])
+    return values[inverse].reshape(np.shape(conditions))
+
+
+def calculate_1_3_batch(
+    w, n_c, rho=None, conditions=None, tolerance=COMPOSITION_TOLERANCE
+):
+    """
+    Пакетный расчёт формулы (1.3) для многих проб газа одним умножением
+    матрицы на вектор: EF = (W @ n_C) * rho * 10^{-2}
+    - w: матрица W_i,j,y проб x компонентов, % об.
+    - n_c: вектор n_C,i по компонентам
+    - rho: rho_CO2 (одно значение или по пробам)
+    - conditions: условия из TABLE_1_2 (одно или по пробам) вместо rho
+    - tolerance: допуск суммы долей, %; None - без проверки
+    Возвращает: массив EF_CO2,j,y по пробам в т CO2/тыс. м3
+    """
+    try:
+        n_c = np.asarray(n_c, dtype=np.float64).ravel()
+        w = _composition_matrix(w, n_c.size, tolerance)
+        if conditions is not None:
+            rho = density_for_conditions(conditions)
+        if rho is None:
+            raise ValueError("не задана плотность CO2 или условия таблицы 1.2")
+        return w @ n_c * np.asarray(rho, dtype=np.float64) * 0.01
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Ошибка в пакетном расчёте формулы 1.3: {e}")
+
+
+def calculate_1_4_batch(w, n_c, m, rho, tolerance=COMPOSITION_TOLERANCE):
+    """
+    Пакетный расчёт формулы (1.4) для многих проб газа одним умножением
+    матрицы на вектор: EF = (W @ (n_C * 44.011 / M)) * rho * 10^{-2}
+    - w: матрица W_i,j,y проб x компонентов, % мас.
+    - n_c, m: векторы n_C,i и M_i по компонентам
+    - rho: rho_j,y (одно значение или по пробам)
+    - tolerance: допуск суммы долей, %; None - без проверки
+    Возвращает: массив EF_CO2,j,y по пробам в т CO2/тыс. м3
+    """
+    try:
+        carbon = np.asarray(n_c, dtype=np.float64).ravel() * 44.011
+        m = np.asarray(m, dtype=np.float64).ravel()
+        # Как и calculate_1_4: нулевая молярная масса - ошибка, а не inf
+        if np.any(m == 0):
+            raise ValueError("M_i не может быть 0")
+        carbon /= m
+        w = _composition_matrix(w, carbon.size, tolerance)
+        return w @ carbon * np.asarray(rho, dtype=np.float64) * 0.01
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Ошибка в пакетном расчёте формулы 1.4: {e}")
+
+
 def calculate_1_5(w_c):
     """
     Расчёт формулы (1.5): EF_CO2,j,y = W_C,j,y * 3.664
@@ -149,7 +309,12 @@ def calculate_1_9(cc_a, cc_f):
     Возвращает: OF_j,y в долях
     """
     try:
-        if cc_f == 0:
+        # Проверка массива только для массивов: построчные вызовы из интерфейса
+        # и cli не должны платить за преобразование числа в массив
+        if isinstance(cc_f, (int, float)):
+            if cc_f == 0:
+                raise ValueError("Деление на ноль: CC_F,y не может быть 0")
+        elif np.any(np.asarray(cc_f) == 0):
             raise ValueError("Деление на ноль: CC_F,y не может быть 0")
         return 1 - cc_a / cc_f
     except (TypeError, ValueError) as e:
@@ -411,3 +576,20 @@ CATEGORIES = {
     },
     # Добавьте другие категории здесь для будущего расширения
 }
+
+
+def find_formula(formula_key):
+    """
+    Поиск формулы по ключу во всех категориях CATEGORIES
+    - formula_key: ключ формулы, например "(1.2а)"; скобки можно опустить,
+      латинские "a"/"b" в суффиксе заменяются на кириллические "а"/"б"
+    Возвращает: словарь формулы из CATEGORIES
+    """
+    key = formula_key.strip()
+    if not key.startswith("("):
+        key = f"({key})"
+    key = key.replace("a)", "а)").replace("b)", "б)")
+    for formulas in CATEGORIES.values():
+        if key in formulas:
+            return formulas[key]
+    raise ValueError(f"Неизвестная формула: {formula_key}")
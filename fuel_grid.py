@@ -0,0 +1,204 @@
+# fuel_grid.py - Виртуализированная таблица строк топлива формулы (1.1)
+
+# Виджеты создаются только для строк, которые помещаются в видимую область;
+# при прокрутке те же виджеты перепривязываются к другим строкам FuelListModel.
+# Поэтому число виджетов не зависит от числа строк, и список из десятков тысяч
+# видов топлива прокручивается и редактируется без задержек.
+
+import tkinter as tk
+from tkinter import ttk
+
+from fuel_model import FIELDS
+from fuel_table import FUEL_TABLE
+from units import BASIS
+
+UNITS = list(BASIS)  # Единицы FC в (1.1)
+ROW_HEIGHT = 32  # Высота строки до первого измерения, px
+WHEEL_ROWS = 3  # Строк за один шаг колеса мыши
+
+
+class FuelGrid(ttk.Frame):
+    """
+    Таблица строк топлива поверх FuelListModel
+    - model: модель строк
+    - on_fuel_change(row_id): выбор топлива или единиц в строке
+    - on_sub_calc(field, row_id): кнопка расчёта FC, EF или OF строки
+    - make_latex_label(parent, latex, size): метка LaTeX для заголовков столбцов
+    - header_latex: {поле: (latex, размер)}
+    """
+
+    def __init__(
+        self, parent, model, on_fuel_change, on_sub_calc, make_latex_label, header_latex
+    ):
+        super().__init__(parent)
+        self.model = model
+        self.on_fuel_change = on_fuel_change
+        self.on_sub_calc = on_sub_calc
+        self.first = 0  # Позиция строки модели в верхней строке таблицы
+        self.slots = []  # Пул виджетов видимых строк
+        self.row_height = None
+        self._loading = False  # Запись в переменные из модели, а не ввод
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.body = ttk.Frame(self)
+        self.body.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        # Размер таблицы задаёт окно, а не число созданных строк
+        self.body.grid_propagate(False)
+
+        # Заголовки столбцов: LaTeX рендерится один раз на таблицу
+        ttk.Label(self.body, text="Тип топлива", font=("Arial", 10)).grid(
+            row=0, column=0
+        )
+        ttk.Label(self.body, text="Единицы", font=("Arial", 10)).grid(row=0, column=1)
+        for i, field in enumerate(FIELDS):
+            label = make_latex_label(self.body, *header_latex[field])
+            label.grid(row=0, column=2 + 2 * i, columnspan=2)
+        self.header_height = ROW_HEIGHT
+
+        self.body.bind("<Configure>", self.on_resize)
+        self.bind_wheel(self.body)
+
+    def bind_wheel(self, widget):
+        widget.bind(
+            "<MouseWheel>",
+            lambda e: self.scroll_rows(-int(e.delta / 120) * WHEEL_ROWS),
+        )
+        widget.bind("<Button-4>", lambda e: self.scroll_rows(-WHEEL_ROWS))
+        widget.bind("<Button-5>", lambda e: self.scroll_rows(WHEEL_ROWS))
+
+    def create_slot(self, index):
+        grid_row = index + 1
+        slot = {"row_id": None, "vars": {}, "widgets": []}
+        for name in ("fuel", "unit") + FIELDS:
+            slot["vars"][name] = tk.StringVar(self.body)
+
+        fuel_combo = ttk.Combobox(
+            self.body,
+            values=FUEL_TABLE.names,
+            width=35,
+            textvariable=slot["vars"]["fuel"],
+        )
+        unit_combo = ttk.Combobox(
+            self.body, values=UNITS, width=8, textvariable=slot["vars"]["unit"]
+        )
+        for combo in (fuel_combo, unit_combo):
+            combo.bind("<<ComboboxSelected>>", lambda e: self.on_select(slot))
+        slot["widgets"] += [fuel_combo, unit_combo]
+        for name in ("fuel", "unit"):
+            slot["vars"][name].trace_add("write", lambda *_: self.on_fuel_edit(slot))
+
+        for field in FIELDS:
+            entry = ttk.Entry(self.body, width=12, textvariable=slot["vars"][field])
+            button = ttk.Button(
+                self.body,
+                text=f"Расчёт {field}",
+                command=lambda f=field: self.on_sub_calc(f, slot["row_id"]),
+            )
+            slot["vars"][field].trace_add(
+                "write", lambda *_, f=field: self.on_value_edit(slot, f)
+            )
+            slot["widgets"] += [entry, button]
+
+        remove_btn = ttk.Button(
+            self.body, text="Удалить", command=lambda: self.remove_row(slot["row_id"])
+        )
+        slot["widgets"].append(remove_btn)
+
+        for column, widget in enumerate(slot["widgets"]):
+            widget.grid(row=grid_row, column=column, padx=0, pady=0)
+            self.bind_wheel(widget)
+        return slot
+
+    def on_resize(self, event=None):
+        if self.row_height is None and self.slots:
+            self.update_idletasks()
+            self.row_height = max(w.winfo_reqheight() for w in self.slots[0]["widgets"])
+            self.header_height = max(
+                w.winfo_reqheight() for w in self.body.grid_slaves(row=0)
+            )
+        height = self.body.winfo_height()
+        visible = max(
+            1, (height - self.header_height) // (self.row_height or ROW_HEIGHT)
+        )
+        while len(self.slots) < visible:
+            self.slots.append(self.create_slot(len(self.slots)))
+        while len(self.slots) > visible:
+            for widget in self.slots.pop()["widgets"]:
+                widget.destroy()
+        if self.row_height is None:
+            # Первое измерение высоты строки после создания виджетов
+            self.after_idle(self.on_resize)
+        self.refresh()
+
+    def refresh(self):
+        """Перепривязка видимых виджетов к строкам модели"""
+        n_rows = len(self.model)
+        self.first = max(0, min(self.first, n_rows - len(self.slots)))
+        self._loading = True
+        try:
+            for i, slot in enumerate(self.slots):
+                position = self.first + i
+                if position >= n_rows:
+                    slot["row_id"] = None
+                    for widget in slot["widgets"]:
+                        widget.grid_remove()
+                    continue
+                row_id, row = self.model.row_at(position)
+                slot["row_id"] = row_id
+                slot["vars"]["fuel"].set(row["fuel"])
+                slot["vars"]["unit"].set(row["unit"])
+                for field in FIELDS:
+                    slot["vars"][field].set(row["text"][field])
+                for widget in slot["widgets"]:
+                    widget.grid()
+        finally:
+            self._loading = False
+        if n_rows:
+            self.scrollbar.set(
+                self.first / n_rows, min(1.0, (self.first + len(self.slots)) / n_rows)
+            )
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def on_scroll(self, action, value, what=None):
+        # Протокол команды ttk.Scrollbar: moveto доля | scroll n units/pages
+        if action == "moveto":
+            self.first = int(float(value) * len(self.model))
+            self.refresh()
+        elif action == "scroll":
+            step = len(self.slots) if what == "pages" else 1
+            self.scroll_rows(int(value) * step)
+
+    def scroll_rows(self, count):
+        self.first += count
+        self.refresh()
+
+    def scroll_to_end(self):
+        self.first = len(self.model)
+        self.refresh()
+
+    def on_value_edit(self, slot, field):
+        # Изменение поля пересчитывает только вклад этой строки
+        if self._loading or slot["row_id"] is None:
+            return
+        self.model.set_value(slot["row_id"], field, slot["vars"][field].get())
+
+    def on_fuel_edit(self, slot):
+        if self._loading or slot["row_id"] is None:
+            return
+        self.model.set_fuel(
+            slot["row_id"], slot["vars"]["fuel"].get(), slot["vars"]["unit"].get()
+        )
+
+    def on_select(self, slot):
+        if slot["row_id"] is None:
+            return
+        self.on_fuel_change(slot["row_id"])
+        self.refresh()
+
+    def remove_row(self, row_id):
+        if row_id is None:
+            return
+        self.model.remove_row(row_id)
+        self.refresh()
@@ -0,0 +1,172 @@
+# fuel_model.py - Модель списка топлива формулы (1.1) с инкрементальным пересчётом
+
+import math
+
+FIELDS = ("FC", "EF", "OF")
+
+
+def parse_number(text):
+    """Число из текста поля ввода (допускается запятая); None, если не число"""
+    try:
+        value = float(str(text).strip().replace(",", "."))
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+class FuelListModel:
+    """
+    Строки формулы (1.1) с вкладами FC_j,y * EF_CO2,j,y * OF_j,y и текущей суммой.
+    Изменение, добавление или удаление строки меняет сумму на разницу вкладов
+    этой строки за O(1); незаполненные строки дают вклад 0 и учитываются в invalid.
+    Порядок отображения - список ячеек, в котором удалённые строки помечаются
+    пустыми, и дерево Фенвика по занятым ячейкам: удаление строки и поиск строки
+    по позиции (row_at) - O(log n); список уплотняется, когда пустых ячеек
+    становится больше, чем строк (в среднем O(1) на удаление).
+    """
+
+    # Через сколько инкрементальных изменений сумма пересчитывается точно (fsum),
+    # чтобы не накапливалась ошибка округления
+    RESUM_INTERVAL = 10000
+
+    def __init__(self, on_change=None):
+        self.rows = {}
+        self._slots = []  # Ячейка -> id строки (None - строка удалена)
+        self._slot_of = {}  # id строки -> ячейка
+        self._tree = [0]  # Дерево Фенвика по занятым ячейкам (с 1)
+        self.total = 0.0
+        self.invalid = set()
+        self.on_change = on_change
+        self._next_id = 0
+        self._updates = 0
+
+    def add_row(self, fuel="", unit="", **values):
+        """Добавление строки; values - FC, EF, OF (число или текст). Возвращает: id"""
+        row_id = self._next_id
+        self._next_id += 1
+        row = {"fuel": fuel, "unit": unit, "contribution": 0.0, "text": {}}
+        for field in FIELDS:
+            row["text"][field] = str(values.get(field, ""))
+            row[field] = parse_number(row["text"][field])
+        self.rows[row_id] = row
+        self._append_slot(row_id)
+        self._update_contribution(row_id)
+        return row_id
+
+    def remove_row(self, row_id):
+        row = self.rows.pop(row_id)
+        self._remove_slot(self._slot_of.pop(row_id))
+        self.invalid.discard(row_id)
+        self._apply_delta(row_id, -row["contribution"])
+
+    @property
+    def order(self):
+        """Идентификаторы строк в порядке отображения (новый список, O(n))"""
+        return [row_id for row_id in self._slots if row_id is not None]
+
+    # Позиции строк: дерево Фенвика по занятым ячейкам _slots
+
+    def _prefix(self, i):
+        """Число строк в ячейках 0..i-1"""
+        tree, count = self._tree, 0
+        while i > 0:
+            count += tree[i]
+            i -= i & -i
+        return count
+
+    def _append_slot(self, row_id):
+        self._slots.append(row_id)
+        self._slot_of[row_id] = len(self._slots) - 1
+        i = len(self._slots)
+        # Узел i покрывает ячейки (i - младший бит i, i]
+        self._tree.append(1 + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+
+    def _remove_slot(self, slot):
+        self._slots[slot] = None
+        tree, i, n = self._tree, slot + 1, len(self._slots)
+        while i <= n:
+            tree[i] -= 1
+            i += i & -i
+        if len(self._slots) - len(self.rows) > len(self.rows):
+            self._compact()
+
+    def _compact(self):
+        """Удаление пустых ячеек и перестроение дерева за O(n)"""
+        self._slots = self.order
+        self._slot_of = {row_id: slot for slot, row_id in enumerate(self._slots)}
+        tree = [0] + [1] * len(self._slots)
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _find_slot(self, position):
+        """Ячейка строки с номером position (с 0) среди оставшихся строк"""
+        tree, slot, rest = self._tree, 0, position + 1
+        step = 1 << (len(self._slots).bit_length() - 1) if self._slots else 0
+        while step:
+            if slot + step < len(tree) and tree[slot + step] < rest:
+                slot += step
+                rest -= tree[slot]
+            step >>= 1
+        return slot
+
+    def set_value(self, row_id, field, value):
+        """Изменение FC, EF или OF строки (число или текст) с пересчётом её вклада"""
+        if field not in FIELDS:
+            raise ValueError(f"Неизвестное поле строки топлива: {field}")
+        row = self.rows[row_id]
+        row["text"][field] = str(value)
+        row[field] = parse_number(value)
+        self._update_contribution(row_id)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def row_at(self, position):
+        """Строка по позиции в списке. Возвращает: (id, строка)"""
+        n_rows = len(self.rows)
+        if position < 0:
+            position += n_rows
+        if not 0 <= position < n_rows:
+            raise IndexError(f"Нет строки топлива с позицией {position}")
+        row_id = self._slots[self._find_slot(position)]
+        return row_id, self.rows[row_id]
+
+    def set_fuel(self, row_id, fuel, unit):
+        row = self.rows[row_id]
+        row["fuel"], row["unit"] = fuel, unit
+
+    def _update_contribution(self, row_id):
+        row = self.rows[row_id]
+        values = [row[field] for field in FIELDS]
+        if None in values:
+            self.invalid.add(row_id)
+            contribution = 0.0
+        else:
+            self.invalid.discard(row_id)
+            contribution = values[0] * values[1] * values[2]
+        delta = contribution - row["contribution"]
+        row["contribution"] = contribution
+        self._apply_delta(row_id, delta)
+
+    def _apply_delta(self, row_id, delta):
+        self._updates += 1
+        if self._updates >= self.RESUM_INTERVAL:
+            self.resum()
+        else:
+            self.total += delta
+        if self.on_change:
+            self.on_change(self, row_id)
+
+    def resum(self):
+        """Точный пересчёт суммы по вкладам строк"""
+        self._updates = 0
+        self.total = math.fsum(row["contribution"] for row in self.rows.values())
+        return self.total
+
+    def columns(self):
+        """Списки FC, EF, OF заполненных строк для calculate_1_1"""
+        complete = [self.rows[i] for i in self.order if i not in self.invalid]
+        return [[row[field] for row in complete] for field in FIELDS]
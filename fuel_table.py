@@ -0,0 +1,77 @@
+# fuel_table.py - Столбцовое представление таблицы 1.1 с целочисленными идентификаторами топлива
+
+# Строится один раз из TABLE_1_1: идентификатор топлива - позиция в таблице
+# (совпадает с индексом в выпадающем списке топлива), коэффициенты - массивы NumPy.
+# Для пакетных расчётов коэффициенты выбираются одной операцией fancy-index.
+
+import sys
+
+import numpy as np
+
+from data_tables import TABLE_1_1
+
+COLUMNS = ("k", "NCV", "EF", "EF_TJ", "W", "W_TJ")
+TYPE_CODES = ("gas", "liquid", "solid")
+
+
+class FuelTable:
+    def __init__(self, table):
+        self.names = tuple(sys.intern(name) for name in table)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.columns = {
+            column: np.array([table[name][column] for name in self.names], float)
+            for column in COLUMNS
+        }
+        self.type_code = np.array(
+            [TYPE_CODES.index(table[name]["type"]) for name in self.names],
+            dtype=np.int8,
+        )
+        for array in (*self.columns.values(), self.type_code):
+            array.flags.writeable = False
+
+    def __len__(self):
+        return len(self.names)
+
+    def fuel_id(self, name):
+        """Идентификатор топлива по названию; -1, если топлива нет в таблице"""
+        return self.ids.get(name, -1)
+
+    def fuel_ids(self, names):
+        """
+        Идентификаторы для массива названий (один поиск в словаре на запись,
+        далее все коэффициенты выбираются по целым идентификаторам)
+        Возвращает: массив int32, -1 для неизвестных видов топлива
+        """
+        names = np.asarray(names)
+        get = self.ids.get
+        ids = np.fromiter(
+            (get(name, -1) for name in names.ravel().tolist()),
+            dtype=np.int32,
+            count=names.size,
+        )
+        return ids.reshape(names.shape)
+
+    def gather(self, column, ids):
+        """
+        Значения коэффициента для массива идентификаторов топлива
+        - column: "k", "NCV", "EF", "EF_TJ", "W", "W_TJ" или "type"
+        - ids: массив идентификаторов (например, из fuel_ids)
+        Возвращает: массив значений той же формы
+        """
+        ids = np.asarray(ids)
+        if ids.size and (ids.min() < 0 or ids.max() >= len(self)):
+            bad = np.flatnonzero((ids.ravel() < 0) | (ids.ravel() >= len(self)))
+            raise ValueError(
+                f"Неизвестные виды топлива в строках: {', '.join(map(str, bad[:10]))}"
+            )
+        source = self.type_code if column == "type" else self.columns[column]
+        return source[ids]
+
+    def value(self, column, fuel_id):
+        """Одно значение коэффициента (для интерфейса)"""
+        if column == "type":
+            return TYPE_CODES[self.type_code[fuel_id]]
+        return float(self.columns[column][fuel_id])
+
+
+FUEL_TABLE = FuelTable(TABLE_1_1)
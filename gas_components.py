@@ -0,0 +1,159 @@
+# gas_components.py - Справочник компонентов газообразного топлива для формул (1.3) и (1.4)
+
+# Для каждого компонента заданы число атомов углерода n_C,i и молярная масса M_i,
+# г/моль. Справочник строится один раз: позиции компонентов, векторы n_C и M
+# (только для чтения). Состав пробы задаётся разреженно - словарём
+# {компонент: доля, %} - и упаковывается в плотный вектор или матрицу проб один
+# раз; дальнейшие расчёты EF выполняются пакетными формулами над этими массивами
+# без разбора строк и поиска компонентов.
+
+import numpy as np
+
+from formulas import COMPOSITION_TOLERANCE, calculate_1_3_batch, calculate_1_4_batch
+
+# (обозначение, название, n_C,i, M_i г/моль, другие написания)
+COMPONENTS = (
+    ("CH4", "Метан", 1, 16.043, ("C1",)),
+    ("C2H6", "Этан", 2, 30.069, ("C2",)),
+    ("C3H8", "Пропан", 3, 44.096, ("C3",)),
+    ("i-C4H10", "Изобутан", 4, 58.122, ("iC4H10", "iC4")),
+    ("n-C4H10", "н-Бутан", 4, 58.122, ("nC4H10", "nC4", "C4H10", "C4")),
+    ("i-C5H12", "Изопентан", 5, 72.149, ("iC5H12", "iC5")),
+    ("n-C5H12", "н-Пентан", 5, 72.149, ("nC5H12", "nC5", "C5H12", "C5")),
+    ("C6H14", "Гексаны", 6, 86.175, ("C6", "C6+")),
+    ("C7H16", "Гептаны", 7, 100.202, ("C7", "C7+")),
+    ("C2H4", "Этилен", 2, 28.054, ()),
+    ("C3H6", "Пропилен", 3, 42.080, ()),
+    ("CO2", "Диоксид углерода", 1, 44.010, ()),
+    ("CO", "Оксид углерода", 1, 28.010, ()),
+    ("N2", "Азот", 0, 28.014, ()),
+    ("O2", "Кислород", 0, 31.999, ()),
+    ("H2", "Водород", 0, 2.016, ()),
+    ("H2S", "Сероводород", 0, 34.081, ()),
+    ("He", "Гелий", 0, 4.003, ()),
+    ("Ar", "Аргон", 0, 39.948, ()),
+    ("H2O", "Вода", 0, 18.015, ()),
+)
+
+# Формулы, принимающие состав газа
+COMPOSITION_FORMULAS = ("(1.3)", "(1.4)")
+
+
+class ComponentRegistry:
+    """
+    Справочник компонентов: позиции, векторы n_C,i и M_i
+    - components: кортежи (обозначение, название, n_C, M, другие написания)
+    """
+
+    def __init__(self, components=COMPONENTS):
+        self.names = tuple(component[0] for component in components)
+        self.titles = tuple(component[1] for component in components)
+        self.n_c = np.array([component[2] for component in components], float)
+        self.molar_mass = np.array([component[3] for component in components], float)
+        for array in (self.n_c, self.molar_mass):
+            array.flags.writeable = False
+        # Поиск без учёта регистра по обозначению, названию и другим написаниям
+        self.index = {}
+        for i, (name, title, _, _, aliases) in enumerate(components):
+            for key in (name, title, *aliases):
+                self.index[key.lower()] = i
+
+    def __len__(self):
+        return len(self.names)
+
+    def position(self, name):
+        """Позиция компонента по обозначению; ValueError для неизвестного"""
+        try:
+            return self.index[name.strip().lower()]
+        except KeyError:
+            raise ValueError(f"Неизвестный компонент газа: {name}")
+
+    def parse(self, text):
+        """
+        Разбор состава вида "CH4=92.5, C2H6=3.1" (или "CH4: 92,5; C2H6: 3,1")
+        Возвращает: словарь {обозначение компонента: доля, %}
+        """
+        # Если элементы разделены ";" или строками, запятая - десятичный знак
+        if ";" in text or "\n" in text:
+            items = text.replace("\n", ";").split(";")
+        else:
+            items = text.split(",")
+        composition = {}
+        for item in items:
+            if not item.strip():
+                continue
+            name, sep, value = item.replace(":", "=").partition("=")
+            if not sep:
+                raise ValueError(f"Ожидается компонент=доля: {item.strip()}")
+            key = self.names[self.position(name)]
+            try:
+                fraction = float(value.strip().replace(",", "."))
+            except ValueError:
+                raise ValueError(f"Неверная доля компонента {key}: {value.strip()}")
+            composition[key] = composition.get(key, 0.0) + fraction
+        if not composition:
+            raise ValueError("Состав газа не задан")
+        return composition
+
+    def pack(self, composition):
+        """Плотный вектор долей по позициям справочника из словаря или строки"""
+        return self.pack_many([composition])[0]
+
+    def pack_many(self, compositions):
+        """
+        Матрица долей проб x компонентов из списка составов (словарей или строк)
+        Позиции всех долей находятся за один проход, матрица заполняется одной
+        операцией по индексам
+        """
+        rows, columns, values = [], [], []
+        position = self.position
+        for row, composition in enumerate(compositions):
+            if isinstance(composition, str):
+                composition = self.parse(composition)
+            for name, fraction in composition.items():
+                rows.append(row)
+                columns.append(position(name))
+                values.append(fraction)
+        matrix = np.zeros((len(compositions), len(self)))
+        # Повторы компонента в составе складываются
+        np.add.at(matrix, (rows, columns), values)
+        return matrix
+
+    def ef(
+        self,
+        formula_key,
+        compositions,
+        rho=None,
+        conditions=None,
+        tolerance=COMPOSITION_TOLERANCE,
+    ):
+        """
+        EF_CO2,j,y по составам газа
+        - formula_key: "(1.3)" (объёмные доли) или "(1.4)" (массовые доли)
+        - compositions: один состав (словарь, строка, вектор) или матрица / список
+          составов; упакованные массивы используются без преобразований
+        - rho: rho_CO2 для (1.3) или плотность топлива для (1.4)
+        - conditions: условия таблицы 1.2 вместо rho для (1.3)
+        Возвращает: число для одного состава, иначе массив по пробам
+        """
+        if isinstance(compositions, (dict, str)):
+            single, matrix = True, self.pack_many([compositions])
+        elif len(compositions) and isinstance(compositions[0], (dict, str)):
+            single, matrix = False, self.pack_many(compositions)
+        else:
+            matrix = np.asarray(compositions, dtype=np.float64)
+            single = matrix.ndim == 1
+        if formula_key == "(1.3)":
+            result = calculate_1_3_batch(matrix, self.n_c, rho, conditions, tolerance)
+        elif formula_key == "(1.4)":
+            if rho is None:
+                raise ValueError("Не задана плотность топлива для (1.4)")
+            result = calculate_1_4_batch(
+                matrix, self.n_c, self.molar_mass, rho, tolerance
+            )
+        else:
+            raise ValueError(f"Формула {formula_key} не использует состав газа")
+        return float(result[0]) if single else result
+
+
+GAS_COMPONENTS = ComponentRegistry()
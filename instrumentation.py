@@ -0,0 +1,522 @@
+# instrumentation.py - Счётчики вызовов, гистограммы задержек и профилирование расчётов
+
+# Точки измерения (функции формул CATEGORIES и узлов графа formula_graph, выбор
+# коэффициентов, рендеринг LaTeX, экспорт) подменяются обёртками только при
+# enable() и восстанавливаются при disable(): в выключенном состоянии вызываются
+# исходные функции без каких-либо проверок. Функции, импортированные по имени (from formulas import
+# ...), подменяются и в уже загруженных модулях проекта. Время вызова
+# раскладывается по корзинам-степеням двойки в микросекундах, поэтому запись
+# одного вызова - несколько операций без выделения памяти.
+# Профилирование (cProfile или выборочное по всем потокам) включается отдельно
+# для конкретного прогона: with profile("run.prof"): ...
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Корзина 0 - меньше 1 мкс, корзина i - от 2**(i-1) до 2**i мкс, последняя - всё дольше
+N_BUCKETS = 32
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Metric:
+    """Накопленные измерения одной точки: вызовы, ошибки, строки, время"""
+
+    __slots__ = ("name", "calls", "errors", "rows", "total", "min", "max", "buckets")
+
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * N_BUCKETS
+
+    def record(self, seconds, rows=1, error=False):
+        self.calls += 1
+        self.errors += error
+        self.rows += rows
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), N_BUCKETS - 1)] += 1
+
+    def quantile(self, q):
+        """Оценка квантиля времени вызова по гистограмме (верхняя граница корзины), с"""
+        if not self.calls:
+            return 0.0
+        rank = q * self.calls
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(2**i * 1e-6, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "total_s": self.total,
+            "mean_s": self.total / self.calls if self.calls else 0.0,
+            "min_s": self.min if self.calls else 0.0,
+            "max_s": self.max,
+            "p50_s": self.quantile(0.5),
+            "p95_s": self.quantile(0.95),
+            "p99_s": self.quantile(0.99),
+            "rows_per_s": self.rows / self.total if self.total else 0.0,
+            "histogram_us": {
+                ("<1" if i == 0 else f"<{2**i}"): count
+                for i, count in enumerate(self.buckets)
+                if count
+            },
+        }
+
+
+class Metrics:
+    """Набор метрик по именам точек измерения (запись из любых потоков)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.started = time.time()
+
+    def metric(self, name):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = Metric(name)
+            return metric
+
+    def record(self, name, seconds, rows=1, error=False):
+        metric = self.metric(name)
+        with self.lock:
+            metric.record(seconds, rows, error)
+
+    def reset(self):
+        # Объекты Metric сохраняются: на них ссылаются установленные обёртки
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.reset()
+            self.started = time.time()
+
+    def snapshot(self):
+        """Метрики вызывавшихся точек. Возвращает: список словарей по убыванию общего времени"""
+        with self.lock:
+            rows = [m.as_dict() for m in self.metrics.values() if m.calls]
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+    def export(self, path):
+        """Выгрузка метрик в JSON или CSV (по расширению файла)"""
+        rows = self.snapshot()
+        if path.endswith(".csv"):
+            import csv
+
+            fields = (
+                [name for name in rows[0] if name != "histogram_us"] if rows else []
+            )
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fields, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"started": self.started, "exported": time.time(), "metrics": rows},
+                    f,
+                    ensure_ascii=False,
+                    indent=1,
+                )
+        return path
+
+    def report(self, limit=20):
+        """Текстовая таблица метрик для вывода в консоль"""
+        lines = [
+            f"{'Точка':<40} {'вызовы':>9} {'всего, с':>10} {'p50, мс':>9}"
+            f" {'p99, мс':>9} {'строк/с':>12}"
+        ]
+        for row in self.snapshot()[:limit]:
+            lines.append(
+                f"{row['name'][:40]:<40} {row['calls']:>9} {row['total_s']:>10.4f}"
+                f" {row['p50_s'] * 1e3:>9.3f} {row['p99_s'] * 1e3:>9.3f}"
+                f" {row['rows_per_s']:>12.0f}"
+            )
+        return "\n".join(lines)
+
+
+METRICS = Metrics()
+
+
+def _count_rows(index):
+    """Число строк пакета - длина аргумента index (1 для чисел)"""
+
+    def rows(args, kwargs, result):
+        try:
+            return len(args[index])
+        except (IndexError, TypeError):
+            return 1
+
+    return rows
+
+
+def _result_rows(args, kwargs, result):
+    """Число строк - результат функции (например, число выгруженных строк)"""
+    return result if isinstance(result, int) else 1
+
+
+def _result_length(args, kwargs, result):
+    try:
+        return len(result)
+    except TypeError:
+        return 1
+
+
+def measured(function, name, rows=None, metrics=METRICS):
+    """
+    Обёртка функции, записывающая время каждого вызова в metrics
+    - name: имя точки измерения
+    - rows(args, kwargs, result): число обработанных строк (по умолчанию 1)
+    """
+    metric = metrics.metric(name)
+    lock = metrics.lock
+    clock = time.perf_counter
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException:
+            elapsed = clock() - start
+            with lock:
+                metric.record(elapsed, 0, True)
+            raise
+        elapsed = clock() - start
+        count = 1 if rows is None else rows(args, kwargs, result)
+        with lock:
+            metric.record(elapsed, count)
+        return result
+
+    return wrapper
+
+
+# Точки измерения: (модуль, атрибут или "Класс.метод", имя метрики, число строк).
+# Модули с тяжёлыми зависимостями (custom импортирует tkinter) измеряются, только
+# если они уже загружены приложением
+POINTS = (
+    ("formulas", "calculate_1_1_batch", "formula (1.1) batch", _count_rows(0)),
+    ("fuel_table", "FuelTable.fuel_ids", "lookup FuelTable.fuel_ids", _count_rows(1)),
+    ("fuel_table", "FuelTable.gather", "lookup FuelTable.gather", _count_rows(2)),
+    (
+        "coefficient_store",
+        "CoefficientStore.table",
+        "lookup CoefficientStore.table",
+        None,
+    ),
+    (
+        "coefficient_store",
+        "CoefficientStore.resolve",
+        "lookup CoefficientStore.resolve",
+        _count_rows(3),
+    ),
+    ("latex_cache", "render_latex_png", "latex render", None),
+    ("latex_cache", "LatexCache.get_png", "latex get_png", None),
+    ("latex_cache", "LatexCache.get_photo", "latex get_photo", None),
+    ("result_store", "ResultStore.add_many", "store add_many", _result_rows),
+    (
+        "result_store",
+        "ResultStore.export_csv",
+        "export ResultStore.export_csv",
+        _result_rows,
+    ),
+    ("custom", "evaluate_formula", "custom evaluate_formula", None),
+    ("custom", "evaluate_table", "custom evaluate_table", _result_length),
+    ("custom", "CustomCalculator.export_result", "export custom results", None),
+)
+OPTIONAL_MODULES = ("custom",)
+
+_installed = []  # (объект, атрибут, исходное значение) для восстановления
+_install_lock = threading.Lock()
+
+
+def enabled():
+    return bool(_installed)
+
+
+def _replace(owner, attr, value):
+    _installed.append((owner, attr, vars(owner)[attr]))
+    setattr(owner, attr, value)
+
+
+def _project_modules():
+    modules = []
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.abspath(path).startswith(PROJECT_DIR + os.sep):
+            modules.append(module)
+    return modules
+
+
+def _result_size(args, kwargs, result):
+    """Число строк - размер массива результата (узлы графа формул)"""
+    return max(1, getattr(result, "size", 1))
+
+
+def _formula_rows(formula_key):
+    # (1.1) принимает списки по видам топлива, остальные формулы - один расчёт
+    return _count_rows(0) if formula_key == "(1.1)" else None
+
+
+def enable(metrics=METRICS):
+    """Установка обёрток во все точки измерения (повторный вызов ничего не делает)"""
+    import importlib
+
+    with _install_lock:
+        if _installed:
+            return
+        functions = {}  # Исходная функция модуля -> обёртка (для подмены в импортёрах)
+        for module_name, attr, name, rows in POINTS:
+            if module_name in OPTIONAL_MODULES and module_name not in sys.modules:
+                continue
+            owner = importlib.import_module(module_name)
+            if "." in attr:
+                class_name, attr = attr.split(".")
+                owner = getattr(owner, class_name)
+                original = owner.__dict__[attr]
+            else:
+                original = getattr(owner, attr)
+            wrapper = measured(original, name, rows, metrics)
+            _replace(owner, attr, wrapper)
+            if not isinstance(owner, type):
+                functions[original] = wrapper
+
+        formulas = importlib.import_module("formulas")
+        for category in formulas.CATEGORIES.values():
+            for formula_key, formula in category.items():
+                original = formula["function"]
+                wrapper = measured(
+                    original,
+                    f"formula {formula_key}",
+                    _formula_rows(formula_key),
+                    metrics,
+                )
+                _installed.append((formula, "function", original))
+                formula["function"] = wrapper
+                functions.setdefault(original, wrapper)
+
+        # Узлы графа формул хранят функции, полученные при импорте, поэтому
+        # подменяются отдельно: расчёт цепочки - массивы по видам топлива
+        formula_graph = importlib.import_module("formula_graph")
+        for node in formula_graph.NODES:
+            original = node["function"]
+            wrapper = measured(
+                original,
+                f"formula {node['formula']} -> {node['output']}",
+                _result_size,
+                metrics,
+            )
+            _installed.append((node, "function", original))
+            node["function"] = wrapper
+
+        for module in _project_modules():
+            if module.__name__ == __name__:
+                continue
+            for attr, value in list(vars(module).items()):
+                try:
+                    wrapper = functions.get(value)
+                except TypeError:  # Нехэшируемые значения модуля
+                    continue
+                if wrapper is not None and getattr(module, attr) is not wrapper:
+                    _replace(module, attr, wrapper)
+
+
+def disable():
+    """Восстановление исходных функций; накопленные метрики сохраняются"""
+    with _install_lock:
+        while _installed:
+            owner, attr, original = _installed.pop()
+            if isinstance(owner, dict):
+                owner[attr] = original
+            else:
+                setattr(owner, attr, original)
+
+
+@contextmanager
+def instrumented(path=None, metrics=METRICS):
+    """Измерения на время блока; при заданном path метрики выгружаются в файл"""
+    was_enabled = enabled()
+    enable(metrics)
+    try:
+        yield metrics
+    finally:
+        if not was_enabled:
+            disable()
+        if path:
+            metrics.export(path)
+
+
+class SamplingProfiler:
+    """
+    Выборочный профилировщик: стеки всех потоков (включая рабочий поток очереди
+    расчётов) снимаются каждые interval секунд в фоновом потоке
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        # Стек (кортеж кадров от внешнего к внутреннему) -> число выборок
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        stacks = self.stacks
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+                    )
+                    frame = frame.f_back
+                key = tuple(reversed(stack))
+                stacks[key] = stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def top(self, limit=20):
+        """Функции по числу выборок: [(функция, собственные, включая вызванные)]"""
+        own, inclusive = {}, {}
+        for stack, count in self.stacks.items():
+            own[stack[-1]] = own.get(stack[-1], 0) + count
+            for name in set(stack):
+                inclusive[name] = inclusive.get(name, 0) + count
+        names = sorted(
+            inclusive, key=lambda n: (own.get(n, 0), inclusive[n]), reverse=True
+        )
+        return [(name, own.get(name, 0), inclusive[name]) for name in names[:limit]]
+
+    def dump(self, path):
+        """Стеки в свёрнутом формате (flamegraph.pl, speedscope): "a;b;c число" """
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{';'.join(stack)} {count}\n")
+        return path
+
+
+class Profiler:
+    """
+    Профилирование прогона
+    - mode: "cprofile" (точные счётчики, только поток, вызвавший start) или
+      "sampling" (все потоки, малые накладные расходы)
+    - interval: период выборки для "sampling", с
+    """
+
+    MODES = ("cprofile", "sampling")
+
+    def __init__(self, mode="cprofile", interval=0.005):
+        if mode not in self.MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        self.mode = mode
+        if mode == "cprofile":
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+        else:
+            self.profiler = SamplingProfiler(interval)
+
+    def start(self):
+        if self.mode == "cprofile":
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+        return self
+
+    def stop(self):
+        if self.mode == "cprofile":
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+        return self
+
+    def dump(self, path):
+        """
+        Сохранение результатов: для cProfile - .prof (pstats, snakeviz) или
+        текстовый отчёт для других расширений; для выборок - свёрнутые стеки
+        """
+        if self.mode == "sampling":
+            return self.profiler.dump(path)
+        if path.endswith(".prof"):
+            self.profiler.dump_stats(path)
+        else:
+            import pstats
+
+            with open(path, "w", encoding="utf-8") as f:
+                stats = pstats.Stats(self.profiler, stream=f)
+                stats.sort_stats("cumulative").print_stats(50)
+        return path
+
+
+@contextmanager
+def profile(path=None, mode="cprofile", interval=0.005):
+    """Профилирование блока; при заданном path результаты сохраняются в файл"""
+    profiler = Profiler(mode, interval).start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        if path:
+            profiler.dump(path)
+
+
+def from_environment(environ=os.environ):
+    """
+    Включение измерений по переменным окружения (для графического приложения):
+    GHG_METRICS=путь - метрики, GHG_PROFILE=путь - профиль, GHG_PROFILE_MODE -
+    режим профилирования (по умолчанию sampling: расчёты идут в рабочем потоке).
+    Результаты сохраняются при выходе из программы
+    """
+    metrics_path = environ.get("GHG_METRICS")
+    profile_path = environ.get("GHG_PROFILE")
+    if metrics_path:
+        enable()
+        atexit.register(METRICS.export, metrics_path)
+    if profile_path:
+        profiler = Profiler(environ.get("GHG_PROFILE_MODE", "sampling")).start()
+
+        def finish():
+            profiler.stop()
+            profiler.dump(profile_path)
+
+        atexit.register(finish)
@@ -0,0 +1,189 @@
+# latex_cache.py - Двухуровневый кэш отрендеренных LaTeX-меток (память + PNG на диске)
+
+# matplotlib и PIL импортируются при первом рендеринге/декодировании, чтобы не
+# замедлять запуск приложения
+
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+# Увеличить при изменении параметров рендеринга - старые PNG перестанут использоваться
+CACHE_VERSION = 1
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ghgcalculator", "latex")
+DPI = 150
+
+
+def render_latex_png(latex_text, size=(6, 1), dpi=DPI):
+    """
+    Рендеринг LaTeX-строки в PNG через matplotlib (без pyplot, поэтому функцию
+    можно вызывать в рабочих процессах)
+    - latex_text: формула без обрамляющих $
+    - size: размер фигуры в дюймах
+    - dpi: разрешение
+    Возвращает: байты PNG
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=size)
+    ax = fig.add_subplot()
+    ax.text(0.5, 0.5, f"${latex_text}$", fontsize=12, ha="center", va="center")
+    ax.axis("off")
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=dpi, transparent=True)
+    return buffer.getvalue()
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _render_to_file(task):
+    """Рабочая функция пула процессов: рендеринг ключа в PNG-файл"""
+    key, path = task
+    if not os.path.exists(path):
+        _write_atomic(path, render_latex_png(*key))
+    return path
+
+
+def _matplotlib_version():
+    """Версия matplotlib из метаданных пакета (без импорта самого matplotlib)"""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("matplotlib")
+    except PackageNotFoundError:
+        return "none"
+
+
+class LatexCache:
+    """
+    Кэш LaTeX-меток: LRU готовых PhotoImage в памяти по ключу (latex, size, dpi)
+    поверх PNG-файлов на диске. Каталог на диске включает CACHE_VERSION и версию
+    matplotlib, поэтому при их смене кэш перестраивается.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, maxsize=256):
+        self.cache_dir = cache_dir
+        self._version_dir = None
+        self.maxsize = maxsize
+        self.memory = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._dir_ready = False
+
+    @property
+    def version_dir(self):
+        """Каталог PNG текущей версии кэша (определяется при первом обращении)"""
+        if self._version_dir is None:
+            self._version_dir = os.path.join(
+                self.cache_dir, f"v{CACHE_VERSION}-mpl{_matplotlib_version()}"
+            )
+        return self._version_dir
+
+    @staticmethod
+    def make_key(latex_text, size=(6, 1), dpi=DPI):
+        return latex_text, tuple(float(x) for x in size), int(dpi)
+
+    def path_for(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.version_dir, f"{digest}.png")
+
+    def _prepare_dir(self):
+        """Создание каталога текущей версии и удаление каталогов старых версий"""
+        if self._dir_ready:
+            return
+        parent = os.path.dirname(self.version_dir)
+        os.makedirs(self.version_dir, exist_ok=True)
+        for name in os.listdir(parent):
+            path = os.path.join(parent, name)
+            if path != self.version_dir and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+        self._dir_ready = True
+
+    def has_png(self, latex_text, size=(6, 1), dpi=DPI):
+        """Есть ли готовый PNG метки на диске"""
+        return os.path.exists(self.path_for(self.make_key(latex_text, size, dpi)))
+
+    def get_png(self, latex_text, size=(6, 1), dpi=DPI):
+        """PNG метки с диска; при отсутствии - рендеринг и сохранение на диск"""
+        key = self.make_key(latex_text, size, dpi)
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            self.stats["disk_hits"] += 1
+            return data
+        except OSError:
+            pass
+        self.stats["misses"] += 1
+        data = render_latex_png(*key)
+        try:
+            self._prepare_dir()
+            _write_atomic(path, data)
+        except OSError as e:
+            print(f"Не удалось сохранить LaTeX в кэш: {e}")
+        return data
+
+    def get_photo(self, latex_text, size=(6, 1), dpi=DPI):
+        """PhotoImage метки: из памяти, с диска или после рендеринга"""
+        key = self.make_key(latex_text, size, dpi)
+        photo = self.memory.get(key)
+        if photo is not None:
+            self.memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return photo
+        from PIL import Image, ImageTk
+
+        data = self.get_png(latex_text, size, dpi)
+        photo = ImageTk.PhotoImage(Image.open(BytesIO(data)))
+        self.memory[key] = photo
+        if len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+        return photo
+
+    def prerender(self, items, max_workers=None):
+        """
+        Фоновый рендеринг меток в PNG на диске в пуле процессов (matplotlib не
+        потокобезопасен, поэтому рендеринг идёт в отдельных процессах)
+        - items: список пар (latex, size)
+        Возвращает: поток-демон; после его завершения все метки есть на диске
+        """
+        keys = list(dict.fromkeys(self.make_key(latex, size) for latex, size in items))
+        tasks = [
+            (key, self.path_for(key))
+            for key in keys
+            if not os.path.exists(self.path_for(key))
+        ]
+
+        def run():
+            if not tasks:
+                return
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            try:
+                self._prepare_dir()
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers, mp_context=context) as pool:
+                    for _ in pool.map(_render_to_file, tasks):
+                        pass
+            except Exception as e:
+                print(f"Ошибка фонового рендеринга LaTeX: {e}")
+
+        thread = threading.Thread(target=run, name="latex-prerender", daemon=True)
+        thread.start()
+        return thread
+
+    def clear(self):
+        """Очистка кэша в памяти и на диске"""
+        self.memory.clear()
+        shutil.rmtree(self.version_dir, ignore_errors=True)
+        self._dir_ready = False
+
+
+LATEX_CACHE = LatexCache()
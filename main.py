@@ -1,12 +1,16 @@
 # main.py - Запуск приложения
 
 # Зависимости: pip install ttkthemes matplotlib pillow
+# Измерения: GHG_METRICS=metrics.json GHG_PROFILE=profile.txt python main.py
 
 import tkinter as tk
 from ttkthemes import ThemedTk
 from ui import GHGCalculator
+import instrumentation
 
 if __name__ == "__main__":
+    # После импорта интерфейса: подменяются и функции, импортированные по имени
+    instrumentation.from_environment()
     root = ThemedTk(theme="arc")  # Красивая тема
     app = GHGCalculator(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,467 @@
+# meter_ingest.py - Потоковое сведение показаний счётчиков топлива в расход за периоды
+
+# Почасовые и поминутные показания расходомеров читаются порциями (CSV построчно,
+# .npy - через memory-map) и сразу сводятся в итоги по ряду (объект, топливо,
+# единица) и отчётному периоду (месяц, квартал, год). В памяти хранятся только
+# итоги и последнее показание каждого ряда, поэтому объём памяти не зависит от
+# размера файла. Внутри порции показания упорядочиваются по ряду и времени одной
+# сортировкой; повторы метки времени отбрасываются, пропуски (интервал больше
+# заданного) подсчитываются и при необходимости заполняются. Между порциями
+# показания каждого ряда ожидаются в порядке времени (как в выгрузках
+# расходомеров): более ранние показания учитываются и подсчитываются как
+# unordered, но повторы среди них не распознаются. Итоги - готовые FC_j,y для
+# пакетного расчёта (1.1).
+# Пример: python meter_ingest.py meters.csv --period quarter --interval 1h --emissions
+
+import argparse
+import csv
+import sys
+from itertools import islice
+
+import numpy as np
+
+from formulas import calculate_1_1_batch
+from fuel_table import FUEL_TABLE
+from rollup import factorize, period_labels, period_numbers
+from units import TCE, UNIT_CONVERTER
+
+FIELDS = ("time", "facility", "fuel", "value", "unit")
+KEYS = ("facility", "fuel", "unit")  # Поля, задающие ряд показаний
+
+# Поля итогов по ряду и периоду
+TOTALS = ("consumption", "readings", "duplicates", "unordered", "gaps", "missing")
+
+# OF по умолчанию по типу топлива (как в интерфейсе для формулы (1.1))
+DEFAULT_OF = {"gas": 1.0, "liquid": 1.0, "solid": 0.98}
+
+
+def parse_values(column):
+    """Числа из строк (десятичная точка или запятая); NaN для пустых и неверных"""
+    values = np.asarray(column)
+    if values.dtype.kind in "biuf":
+        return values.astype(np.float64)
+    values = values.astype(str)
+    if np.any(np.char.find(values, ",") >= 0):
+        values = np.char.replace(values, ",", ".")
+    try:
+        return values.astype(np.float64)
+    except ValueError:
+        result = np.full(values.shape, np.nan)
+        for i, text in enumerate(values.tolist()):
+            try:
+                result[i] = float(text)
+            except ValueError:
+                pass
+        return result
+
+
+INTERVAL_UNITS = {"s": "s", "sec": "s", "m": "m", "min": "m", "h": "h", "d": "D"}
+
+
+def parse_interval(interval):
+    """Интервал показаний в timedelta64[s] из "1h", "15min", "30s", "1d" или секунд"""
+    if isinstance(interval, str):
+        text = interval.strip().lower()
+        number = text.rstrip("abcdefghijklmnopqrstuvwxyz")
+        unit = INTERVAL_UNITS.get(text[len(number) :].strip() or "s")
+        if unit is None or not number:
+            raise ValueError(f"Неверный интервал показаний: {interval}")
+        interval = np.timedelta64(int(number), unit)
+    elif not isinstance(interval, np.timedelta64):
+        interval = np.timedelta64(int(interval), "s")
+    interval = interval.astype("timedelta64[s]")
+    if interval <= np.timedelta64(0, "s"):
+        raise ValueError(f"Интервал показаний должен быть положительным: {interval}")
+    return interval
+
+
+def parse_times(column):
+    """Метки времени datetime64[s] из строк ISO ("2024-01-31 23:00"); NaT для неверных"""
+    times = np.asarray(column)
+    if times.dtype.kind == "M":
+        return times.astype("datetime64[s]")
+    times = np.char.replace(times.astype(str), " ", "T")
+    try:
+        return times.astype("datetime64[s]")
+    except ValueError:
+        result = np.full(times.shape, np.datetime64("NaT"), dtype="datetime64[s]")
+        for i, text in enumerate(times.tolist()):
+            try:
+                result[i] = np.datetime64(text, "s")
+            except ValueError:
+                pass
+        return result
+
+
+def read_csv_chunks(path, columns=None, chunk_size=100000, delimiter=","):
+    """
+    Чтение CSV порциями
+    - columns: {поле: заголовок столбца} для полей FIELDS (по умолчанию совпадают)
+    - chunk_size: строк в порции
+    Возвращает: генератор словарей {поле: массив NumPy} (отсутствующие поля не
+    включаются)
+    """
+    columns = dict({field: field for field in FIELDS}, **(columns or {}))
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"Файл {path} пуст (нет строки заголовка)")
+        header = [name.strip() for name in header]
+        positions = {
+            field: header.index(name)
+            for field, name in columns.items()
+            if name in header
+        }
+        for field in ("time", "value"):
+            if field not in positions:
+                raise ValueError(f"Нет столбца {columns[field]} в файле {path}")
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                return
+            width = max(positions.values()) + 1
+            # Пустые строки пропускаются; короткие дополняются пустыми значениями
+            # и учитываются агрегатором как неверные показания
+            rows = [
+                row if len(row) >= width else row + [""] * width for row in rows if row
+            ]
+            table = list(zip(*rows)) if rows else [()] * width
+            yield {field: np.array(table[i]) for field, i in positions.items()}
+
+
+def read_npy_chunks(path, chunk_size=1000000, mmap=True):
+    """
+    Чтение структурированного массива .npy порциями (поля как в FIELDS)
+    - mmap: открыть через memory-map (порции читаются с диска по мере обхода)
+    Возвращает: генератор словарей {поле: массив NumPy}
+    """
+    data = np.load(path, mmap_mode="r" if mmap else None)
+    if not data.dtype.names or not {"time", "value"} <= set(data.dtype.names):
+        raise ValueError(f"В файле {path} нет полей time и value")
+    fields = [field for field in FIELDS if field in data.dtype.names]
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start : start + chunk_size]
+        yield {field: np.asarray(chunk[field]) for field in fields}
+
+
+class MeterAggregator:
+    """
+    Сведение показаний в расход по рядам и периодам
+    - period: "month", "quarter" или "year"
+    - interval: ожидаемый интервал показаний ("1h", "15min", np.timedelta64 или
+      секунды); None - без поиска пропусков
+    - counter: показания - нарастающий итог счётчика (расход - разность
+      соседних показаний, сброс счётчика - начало с нуля); иначе - расход за интервал
+    - fill_gaps: заполнять пропущенные интервалы средним соседних показаний
+      (только для расхода за интервал)
+    - defaults: значения полей facility, fuel, unit для файлов без этих столбцов
+    """
+
+    def __init__(
+        self, period="month", interval=None, counter=False, fill_gaps=False, **defaults
+    ):
+        period_numbers(np.empty(0, dtype="datetime64[s]"), period)  # Проверка периода
+        self.period = period
+        self.interval = None if interval is None else parse_interval(interval)
+        self.counter = counter
+        self.fill_gaps = fill_gaps and not counter
+        self.defaults = {"facility": "", "fuel": "", "unit": TCE, **defaults}
+        self.ids = {field: {} for field in KEYS}  # Значение поля -> код
+        self.labels = {field: [] for field in KEYS}  # Код -> значение поля
+        self.series = {}  # (коды объекта, топлива, единицы) -> номер ряда
+        self.series_keys = []  # Номер ряда -> (объект, топливо, единица)
+        self.last_time = np.empty(0, dtype="datetime64[s]")
+        self.last_value = np.empty(0)
+        self.totals = {}  # (номер ряда, номер периода) -> итоги TOTALS
+        self.rows = 0
+        self.invalid = 0
+
+    def _codes(self, field, chunk, n_rows):
+        """Глобальные коды значений поля порции (словарь только по различным значениям)"""
+        values = chunk.get(field)
+        if values is None:
+            values = np.full(n_rows, self.defaults[field])
+        codes, labels = factorize(np.asarray(values).astype(str))
+        ids, names = self.ids[field], self.labels[field]
+        remap = np.empty(len(labels), dtype=np.int64)
+        for i, label in enumerate(labels.tolist()):
+            if label not in ids:
+                ids[label] = len(names)
+                names.append(label)
+            remap[i] = ids[label]
+        return remap[codes]
+
+    def _series_ids(self, facility, fuel, unit):
+        sizes = tuple(len(self.labels[field]) for field in KEYS)
+        flat, inverse = np.unique(
+            np.ravel_multi_index((facility, fuel, unit), sizes), return_inverse=True
+        )
+        combos = np.unravel_index(flat, sizes)
+        ids = np.empty(len(flat), dtype=np.int64)
+        for i, combo in enumerate(zip(*(codes.tolist() for codes in combos))):
+            if combo not in self.series:
+                self.series[combo] = len(self.series_keys)
+                self.series_keys.append(
+                    tuple(self.labels[field][code] for field, code in zip(KEYS, combo))
+                )
+            ids[i] = self.series[combo]
+        grow = len(self.series) - len(self.last_time)
+        if grow > 0:
+            self.last_time = np.concatenate(
+                [self.last_time, np.full(grow, np.datetime64("NaT"), "datetime64[s]")]
+            )
+            self.last_value = np.concatenate([self.last_value, np.full(grow, np.nan)])
+        return ids[inverse.ravel()]
+
+    def add(self, chunk):
+        """
+        Добавление порции показаний
+        - chunk: словарь {поле: массив} с полями time, value и необязательными
+          facility, fuel, unit (как из read_csv_chunks / read_npy_chunks)
+        """
+        times = parse_times(chunk["time"])
+        values = parse_values(chunk["value"])
+        n_rows = len(times)
+        if not n_rows:
+            return
+        self.rows += n_rows
+        series = self._series_ids(
+            *(self._codes(field, chunk, n_rows) for field in KEYS)
+        )
+        valid = ~np.isnat(times) & ~np.isnan(values)
+        self.invalid += int(n_rows - valid.sum())
+        series, times, values = series[valid], times[valid], values[valid]
+        if not len(series):
+            return
+
+        # Упорядочение по ряду и времени (устойчивое: из повторов метки
+        # остаётся первое по порядку в файле показание)
+        order = np.lexsort((times, series))
+        series, times, values = series[order], times[order], values[order]
+        same_series = series[1:] == series[:-1]
+
+        # Повтор - та же метка, что у предыдущего показания ряда в порции или у
+        # последнего показания ряда из предыдущих порций. Показание раньше
+        # последнего из предыдущих порций учитывается, но без разности с соседним
+        carried = self.last_time[series]
+        duplicate = times == carried
+        duplicate[1:] |= same_series & (times[1:] == times[:-1])
+        unordered = (times < carried) & ~duplicate
+        keep = ~duplicate
+
+        # Разности и пропуски считаются только между показаниями в порядке
+        # времени: предыдущее для них - последнее такое же показание ряда в
+        # порции или последнее показание ряда из предыдущих порций
+        ordered = np.flatnonzero(keep & ~unordered)
+        ordered_series = series[ordered]
+        first = np.ones(len(ordered), dtype=bool)
+        first[1:] = ordered_series[1:] != ordered_series[:-1]
+        prev_time = np.full(len(series), np.datetime64("NaT"), dtype=times.dtype)
+        prev_value = np.full(len(series), np.nan)
+        previous = ordered[:-1]
+        prev_time[ordered[1:]] = times[previous]
+        prev_value[ordered[1:]] = values[previous]
+        prev_time[ordered[first]] = self.last_time[ordered_series[first]]
+        prev_value[ordered[first]] = self.last_value[ordered_series[first]]
+        has_prev = ~np.isnat(prev_time)
+
+        if self.counter:
+            delta = values - prev_value
+            reset = has_prev & (delta < 0)
+            consumption = np.where(has_prev, np.where(reset, values, delta), 0.0)
+        else:
+            consumption = values.copy()
+        gaps = np.zeros(len(series))
+        missing = np.zeros(len(series))
+        if self.interval is not None:
+            step = self.interval.astype(np.float64)
+            elapsed = (times - prev_time).astype("timedelta64[s]").astype(np.float64)
+            lost = np.where(has_prev, np.rint(elapsed / step) - 1, 0.0)
+            gap = has_prev & (elapsed > 1.5 * step)
+            gaps[gap] = 1
+            missing[gap] = lost[gap]
+            if self.fill_gaps:
+                # Пропущенные интервалы - среднее соседних показаний; расход
+                # относится к периоду показания после пропуска
+                consumption[gap] += lost[gap] * (values[gap] + prev_value[gap]) / 2
+
+        self._accumulate(
+            series,
+            period_numbers(times, self.period),
+            np.stack(
+                [
+                    np.where(keep, consumption, 0.0),
+                    keep.astype(np.float64),
+                    duplicate.astype(np.float64),
+                    unordered.astype(np.float64),
+                    np.where(keep, gaps, 0.0),
+                    np.where(keep, missing, 0.0),
+                ]
+            ),
+        )
+
+        # Последнее показание каждого ряда в порядке времени (без повторов и
+        # запоздавших показаний) для следующих порций
+        last = np.ones(len(ordered), dtype=bool)
+        last[:-1] = ordered_series[:-1] != ordered_series[1:]
+        self.last_time[ordered_series[last]] = times[ordered[last]]
+        self.last_value[ordered_series[last]] = values[ordered[last]]
+
+    def _accumulate(self, series, periods, weights):
+        """Итоги порции по (ряд, период) и добавление к накопленным"""
+        first_period = int(periods.min())
+        n_periods = int(periods.max()) - first_period + 1
+        flat = series * n_periods + (periods - first_period)
+        groups, inverse = np.unique(flat, return_inverse=True)
+        sums = np.stack([np.bincount(inverse, w, len(groups)) for w in weights], axis=1)
+        totals = self.totals
+        for group, row in zip(groups.tolist(), sums.tolist()):
+            key = (group // n_periods, group % n_periods + first_period)
+            current = totals.get(key)
+            if current is None:
+                totals[key] = row
+            else:
+                for i, value in enumerate(row):
+                    current[i] += value
+
+    def result(self):
+        """
+        Итоги по рядам и периодам (по рядам в порядке значений и по времени)
+        Возвращает: структурированный массив с полями facility, fuel, unit,
+        period, consumption (расход в единице ряда), readings (учтено показаний),
+        duplicates, unordered, gaps (число пропусков), missing (пропущено интервалов)
+        """
+        keys = sorted(self.totals, key=lambda key: (self.series_keys[key[0]], key[1]))
+        labels = period_labels([period for _, period in keys], self.period)
+        fields = [(field, np.array(self.labels[field] or [""]).dtype) for field in KEYS]
+        fields.append(("period", labels.dtype if len(labels) else "U7"))
+        fields += [(name, np.float64) for name in TOTALS]
+        table = np.empty(len(keys), dtype=fields)
+        for i, field in enumerate(KEYS):
+            table[field] = [self.series_keys[series][i] for series, _ in keys]
+        table["period"] = labels
+        values = np.array([self.totals[key] for key in keys]).reshape(-1, len(TOTALS))
+        for i, name in enumerate(TOTALS):
+            table[name] = values[:, i]
+        return table
+
+
+def ingest(chunks, period="month", **options):
+    """
+    Сведение потока порций в итоги по рядам и периодам
+    - chunks: итерируемое порций (read_csv_chunks, read_npy_chunks)
+    - options: параметры MeterAggregator
+    Возвращает: (итоги result(), агрегатор со счётчиками rows и invalid)
+    """
+    aggregator = MeterAggregator(period, **options)
+    for chunk in chunks:
+        aggregator.add(chunk)
+    return aggregator.result(), aggregator
+
+
+def emissions_1_1(totals, basis=TCE, of_val=None):
+    """
+    Пакетный расчёт (1.1) по итогам: расход в единицах рядов пересчитывается в
+    basis (units.py), EF и OF берутся из таблицы 1.1
+    - of_val: OF для всех строк; по умолчанию по типу топлива
+    Возвращает: результат calculate_1_1_batch с итогами по топливу и объектам
+    """
+    fc, ef = UNIT_CONVERTER.prepare_1_1(
+        totals["consumption"], totals["fuel"], totals["unit"], basis
+    )
+    if of_val is None:
+        types = FUEL_TABLE.gather("type", FUEL_TABLE.fuel_ids(totals["fuel"]))
+        of_by_type = np.array([DEFAULT_OF[t] for t in ("gas", "liquid", "solid")])
+        of_val = of_by_type[types]
+    of_val = np.broadcast_to(np.asarray(of_val, dtype=np.float64), fc.shape)
+    return calculate_1_1_batch(
+        fc, ef, of_val, fuels=totals["fuel"], sites=totals["facility"]
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Сведение показаний счётчиков топлива в расход за периоды"
+    )
+    parser.add_argument("inputs", nargs="+", help="Файлы показаний CSV или .npy")
+    parser.add_argument("-o", "--output", default="-", help="Файл итогов CSV")
+    parser.add_argument(
+        "--period", choices=["month", "quarter", "year"], default="month"
+    )
+    parser.add_argument("--interval", help="Интервал показаний, например 1h или 15min")
+    parser.add_argument(
+        "--counter", action="store_true", help="Показания - нарастающий итог"
+    )
+    parser.add_argument("--fill-gaps", action="store_true")
+    parser.add_argument(
+        "--column",
+        action="append",
+        default=[],
+        metavar="ПОЛЕ=СТОЛБЕЦ",
+        help="Заголовок столбца CSV для поля time, facility, fuel, value, unit",
+    )
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--fuel", default="", help="Топливо для файлов без столбца")
+    parser.add_argument("--unit", default=TCE, help="Единица для файлов без столбца")
+    parser.add_argument(
+        "--emissions",
+        action="store_true",
+        help="Добавить выбросы CO2 по (1.1) (EF и OF из таблицы 1.1)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        columns = dict(item.split("=", 1) for item in args.column)
+    except ValueError:
+        parser.error("--column задаётся как ПОЛЕ=СТОЛБЕЦ")
+
+    def chunks():
+        for path in args.inputs:
+            if path.endswith(".npy"):
+                yield from read_npy_chunks(path, args.chunk_size)
+            else:
+                yield from read_csv_chunks(
+                    path, columns, args.chunk_size, args.delimiter
+                )
+
+    try:
+        totals, aggregator = ingest(
+            chunks(),
+            args.period,
+            interval=args.interval,
+            counter=args.counter,
+            fill_gaps=args.fill_gaps,
+            fuel=args.fuel,
+            unit=args.unit,
+        )
+        emissions = emissions_1_1(totals)["emissions"] if args.emissions else None
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+
+    fout = (
+        sys.stdout
+        if args.output == "-"
+        else open(args.output, "w", newline="", encoding="utf-8")
+    )
+    try:
+        writer = csv.writer(fout)
+        header = list(totals.dtype.names)
+        writer.writerow(header + (["emissions_CO2"] if emissions is not None else []))
+        for i, row in enumerate(totals.tolist()):
+            writer.writerow(row + ((emissions[i],) if emissions is not None else ()))
+    finally:
+        if fout is not sys.stdout:
+            fout.close()
+    print(
+        f"Показаний: {aggregator.rows}, неверных: {aggregator.invalid}, "
+        f"рядов: {len(aggregator.series_keys)}, итогов: {len(totals)}",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+# result_store.py - Локальное хранилище результатов расчётов (SQLite, режим WAL)
+
+# Результаты только добавляются: формула, категория, входные данные (JSON),
+# результат, объект, отчётный период и время расчёта. Индексы по объекту,
+# периоду и формуле позволяют выбирать нужные записи без чтения всей истории,
+# выборки читаются курсором по мере обхода. Режим WAL разрешает чтение
+# одновременно с записью; у каждого потока своё соединение, поэтому запись
+# возможна и из фонового потока очереди расчётов.
+
+import csv
+import json
+import os
+import sqlite3
+import threading
+
+RESULTS_PATH = os.path.join(
+    os.path.expanduser("~"), ".local", "share", "ghgcalculator", "results.sqlite3"
+)
+
+CUSTOM_CATEGORY = "Кастомная формула"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    created TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+    category TEXT NOT NULL DEFAULT '',
+    formula TEXT NOT NULL,
+    facility TEXT NOT NULL DEFAULT '',
+    period TEXT NOT NULL DEFAULT '',
+    inputs TEXT NOT NULL DEFAULT '{}',
+    output REAL  -- NULL, если результат не определён (NaN)
+);
+CREATE INDEX IF NOT EXISTS results_facility_period
+    ON results (facility, period, formula);
+CREATE INDEX IF NOT EXISTS results_formula ON results (formula, period);
+CREATE INDEX IF NOT EXISTS results_category ON results (category, id);
+"""
+
+COLUMNS = (
+    "id",
+    "created",
+    "category",
+    "formula",
+    "facility",
+    "period",
+    "inputs",
+    "output",
+)
+FILTERS = ("category", "formula", "facility", "period")
+
+_encode_inputs = json.JSONEncoder(ensure_ascii=False).encode
+
+
+class ResultStore:
+    """
+    История результатов расчётов в файле SQLite
+    - path: путь к файлу базы (":memory:" - без сохранения, только для одного потока)
+    """
+
+    def __init__(self, path=RESULTS_PATH):
+        self.path = path
+        self._local = threading.local()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection()  # Создание схемы при открытии
+
+    def connection(self):
+        """Соединение текущего потока (создаётся при первом обращении)"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # В режиме WAL NORMAL сохраняет целостность базы при сбое приложения
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def add(self, formula, inputs, output, facility="", period="", category=""):
+        """Запись одного результата. Возвращает: id записи"""
+        connection = self.connection()
+        with connection:
+            cursor = connection.execute(
+                "INSERT INTO results (category, formula, facility, period, inputs, output)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    category,
+                    formula,
+                    facility,
+                    period,
+                    _encode_inputs(inputs),
+                    float(output),
+                ),
+            )
+        return cursor.lastrowid
+
+    def add_many(self, records, batch=10000):
+        """
+        Пакетная запись результатов
+        - records: итерируемое словарей с ключами formula, inputs, output и
+          необязательными facility, period, category
+        - batch: число записей в одной транзакции
+        Возвращает: число записанных результатов
+        """
+        rows = (
+            (
+                record.get("category", ""),
+                record["formula"],
+                record.get("facility", ""),
+                record.get("period", ""),
+                _encode_inputs(record.get("inputs", {})),
+                float(record["output"]),
+            )
+            for record in records
+        )
+        connection = self.connection()
+        count = 0
+        while True:
+            chunk = [row for _, row in zip(range(batch), rows)]
+            if not chunk:
+                return count
+            with connection:
+                connection.executemany(
+                    "INSERT INTO results"
+                    " (category, formula, facility, period, inputs, output)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    chunk,
+                )
+            count += len(chunk)
+
+    def _where(self, filters):
+        unknown = set(filters) - set(FILTERS)
+        if unknown:
+            raise ValueError(f"Неизвестные условия отбора: {', '.join(unknown)}")
+        items = [(name, value) for name, value in filters.items() if value is not None]
+        if not items:
+            return "", ()
+        clause = " WHERE " + " AND ".join(f"{name} = ?" for name, _ in items)
+        return clause, tuple(value for _, value in items)
+
+    def query(self, limit=None, **filters):
+        """
+        Записи по условиям (category, formula, facility, period) в порядке записи
+        Возвращает: генератор словарей; inputs разбирается из JSON
+        """
+        where, params = self._where(filters)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM results{where} ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (int(limit),)
+        for row in self.connection().execute(sql, params):
+            record = dict(zip(COLUMNS, row))
+            record["inputs"] = json.loads(record["inputs"])
+            yield record
+
+    def count(self, **filters):
+        where, params = self._where(filters)
+        return (
+            self.connection()
+            .execute(f"SELECT COUNT(*) FROM results{where}", params)
+            .fetchone()[0]
+        )
+
+    def outputs(self, **filters):
+        """Результаты по условиям в порядке записи. Возвращает: массив NumPy"""
+        import numpy as np
+
+        where, params = self._where(filters)
+        cursor = self.connection().execute(
+            f"SELECT output FROM results{where} ORDER BY id", params
+        )
+        return np.fromiter(
+            (np.nan if row[0] is None else row[0] for row in cursor), dtype=np.float64
+        )
+
+    def export_csv(self, path, **filters):
+        """Выгрузка записей в CSV без загрузки всей истории в память. Возвращает: число строк"""
+        where, params = self._where(filters)
+        cursor = self.connection().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM results{where} ORDER BY id", params
+        )
+        count = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                [
+                    "Расчёт",
+                    "Время",
+                    "Категория",
+                    "Формула",
+                    "Объект",
+                    "Период",
+                    "Входные данные",
+                    "Значение (т CO2-экв.)",
+                ]
+            )
+            for row in cursor:
+                writer.writerow(row)
+                count += 1
+        return count
+
+    def close(self):
+        """Закрытие соединения текущего потока"""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -0,0 +1,194 @@
+# rollup.py - Сводные выбросы по объектам, отчётным периодам, видам топлива и газам
+
+# Записи (например, почасовые выбросы по объектам) группируются один раз по всем
+# ключам сразу: коды ключей сводятся в один индекс (ravel_multi_index) и суммы
+# считаются np.bincount. Итоги более крупных уровней (объект и год, объект,
+# всего) получаются из итогов мелкого уровня, число которых мало по сравнению
+# с числом записей. Пересчёт в CO2-эквивалент - по потенциалам GWP.
+
+import numpy as np
+
+from data_tables import GWP
+
+PERIODS = ("month", "quarter", "year")
+
+# Наибольшее число ячеек плотного массива сумм; при большем числе сочетаний
+# ключей используются только встречающиеся сочетания
+MAX_CELLS = 2**24
+
+
+def factorize(values):
+    """
+    Коды значений ключа
+    - values: массив значений (строки, числа, даты) или уже готовая пара
+      (коды, подписи), например результат period_codes
+    Возвращает: (коды int64 от 0, подписи кодов по возрастанию значений)
+    """
+    if isinstance(values, tuple):
+        codes, labels = values
+        return np.asarray(codes, dtype=np.int64), np.asarray(labels)
+    values = np.asarray(values)
+    if values.dtype.kind in "biufM":
+        labels, codes = np.unique(values, return_inverse=True)
+        return codes.reshape(-1).astype(np.int64), labels
+    if values.dtype.kind == "U":
+        # Значений ключа мало: подписи берутся из выборки записей и проверяются
+        # двоичным поиском; сортировка всего массива строк нужна, только если
+        # в выборку попали не все значения
+        values = values.ravel()
+        labels = np.unique(values[:: max(1, values.size // 65536)])
+        codes = np.minimum(np.searchsorted(labels, values), max(len(labels) - 1, 0))
+        if values.size and not np.array_equal(labels[codes], values):
+            labels, codes = np.unique(values, return_inverse=True)
+        return codes.astype(np.int64), labels
+    # Объекты Python: словарь быстрее сортировки
+    ids = {}
+    codes = np.fromiter(
+        (ids.setdefault(v, len(ids)) for v in values.ravel().tolist()),
+        dtype=np.int64,
+        count=values.size,
+    )
+    labels = sorted(ids)
+    remap = np.empty(len(labels), dtype=np.int64)
+    remap[[ids[label] for label in labels]] = np.arange(len(labels))
+    return remap[codes], np.array(labels)
+
+
+def period_numbers(timestamps, period="month"):
+    """
+    Абсолютные номера отчётных периодов (от 1970 года) для меток времени
+    - timestamps: массив datetime64 (или строк ISO)
+    - period: "month", "quarter" или "year"
+    Возвращает: массив int64 (номера сравнимы между разными массивами меток)
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Неизвестный период: {period}")
+    months = np.asarray(timestamps, dtype="datetime64[M]").astype(np.int64)
+    if period == "month":
+        return months
+    return months // (3 if period == "quarter" else 12)
+
+
+def period_labels(numbers, period="month"):
+    """Подписи периодов "2024-01", "2024-Q1", "2024" по номерам из period_numbers"""
+    numbers = np.asarray(numbers, dtype=np.int64)
+    if period == "month":
+        return numbers.astype("datetime64[M]").astype(str)
+    if period == "quarter":
+        return np.array(
+            [f"{1970 + q // 4}-Q{q % 4 + 1}" for q in numbers.tolist()], dtype="U7"
+        )
+    return (1970 + numbers).astype(str)
+
+
+def period_codes(timestamps, period="month"):
+    """
+    Коды отчётных периодов для меток времени без сортировки и поиска уникальных
+    - timestamps: массив datetime64 (или строк ISO)
+    - period: "month", "quarter" или "year"
+    Возвращает: (коды от 0, подписи периодов "2024-01", "2024-Q1", "2024")
+    """
+    numbers = period_numbers(timestamps, period)
+    if numbers.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype="U7")
+    first = int(numbers.min())
+    count = int(numbers.max()) - first + 1
+    return numbers - first, period_labels(np.arange(first, first + count), period)
+
+
+def _group(codes, sizes, weights):
+    """
+    Суммы по сочетаниям кодов
+    Возвращает: (коды ключей групп по измерениям, число записей, суммы весов)
+    """
+    if not sizes:
+        n_records = len(weights[0]) if weights else 0
+        return [], np.array([n_records]), [np.array([w.sum()]) for w in weights]
+    cells = int(np.prod(sizes, dtype=np.float64))
+    if cells > np.iinfo(np.int64).max:
+        raise ValueError("Слишком много сочетаний значений ключей")
+    flat = np.ravel_multi_index(codes, sizes)
+    if cells <= MAX_CELLS:
+        counts = np.bincount(flat, minlength=cells)
+        groups = np.flatnonzero(counts)
+        sums = [np.bincount(flat, w, minlength=cells)[groups] for w in weights]
+        counts = counts[groups]
+    else:
+        groups, inverse = np.unique(flat, return_inverse=True)
+        counts = np.bincount(inverse)
+        sums = [np.bincount(inverse, w) for w in weights]
+    return list(np.unravel_index(groups, sizes)), counts, sums
+
+
+def rollup(emissions, keys, gas=None, levels=None, gwp=GWP):
+    """
+    Сводные выбросы по уровням группировки
+    - emissions: выбросы по записям, т газа
+    - keys: словарь {имя ключа: значения по записям}, например объект, период
+      (см. period_codes), вид топлива; порядок задаёт уровни по умолчанию
+    - gas: газ каждой записи (CO2, CH4, ...) для пересчёта в CO2-эквивалент;
+      None - все записи в т CO2
+    - levels: список кортежей имён ключей; по умолчанию все префиксы keys
+      (("объект", "период", "топливо"), ("объект", "период"), ("объект",), ())
+    - gwp: потенциалы глобального потепления
+    Возвращает: словарь {уровень: структурированный массив} с полями ключей,
+    "records" (число записей), "emissions" (т газа; если газ входит в уровень
+    или не задан) и "co2e" (т CO2-экв.)
+    """
+    emissions = np.asarray(emissions, dtype=np.float64).ravel()
+    names = list(keys)
+    coded = [factorize(keys[name]) for name in names]
+    if gas is not None:
+        if "gas" in keys:
+            raise ValueError("Имя ключа gas зарезервировано для газа")
+        gas_codes, gas_labels = factorize(gas)
+        unknown = [g for g in gas_labels.tolist() if g not in gwp]
+        if unknown:
+            raise ValueError(f"Нет GWP для газов: {', '.join(map(str, unknown))}")
+        factors = np.array([gwp[g] for g in gas_labels.tolist()], dtype=np.float64)
+        co2e = emissions * factors[gas_codes]
+        coded.append((gas_codes, gas_labels))
+        names.append("gas")
+    else:
+        co2e = emissions
+    for name, (codes, _) in zip(names, coded):
+        if codes.shape != emissions.shape:
+            raise ValueError(f"Длина ключа {name} не совпадает с числом записей")
+
+    if levels is None:
+        base = list(keys)
+        levels = [tuple(base[:i]) for i in range(len(base), -1, -1)]
+
+    # Самый мелкий уровень - все ключи; остальные уровни - из его итогов
+    sizes = tuple(len(labels) for _, labels in coded)
+    weights = [emissions, co2e] if gas is not None else [emissions]
+    group_codes, counts, sums = _group([c for c, _ in coded], sizes, weights)
+    position = {name: i for i, name in enumerate(names)}
+
+    result = {}
+    for level in levels:
+        level = tuple(level)
+        missing = [name for name in level if name not in position]
+        if missing:
+            raise ValueError(f"Нет ключей для уровня: {', '.join(missing)}")
+        dims = [position[name] for name in level]
+        level_codes, level_counts, level_sums = _group(
+            [group_codes[d] for d in dims],
+            tuple(sizes[d] for d in dims),
+            [counts.astype(np.float64)] + sums,
+        )
+        fields = [(name, coded[d][1].dtype) for name, d in zip(level, dims)]
+        fields.append(("records", np.int64))
+        with_mass = gas is None or "gas" in level
+        if with_mass:
+            fields.append(("emissions", np.float64))
+        fields.append(("co2e", np.float64))
+        table = np.empty(len(level_counts), dtype=fields)
+        for name, d, codes in zip(level, dims, level_codes):
+            table[name] = coded[d][1][codes]
+        table["records"] = np.rint(level_sums[0]).astype(np.int64)
+        if with_mass:
+            table["emissions"] = level_sums[1]
+        table["co2e"] = level_sums[-1]
+        result[level] = table
+    return result
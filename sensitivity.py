@@ -0,0 +1,126 @@
+# sensitivity.py - Анализ чувствительности и вкладов для выбросов от стационарного сжигания
+
+# Частные производные формул берутся символьно: функции формул из CATEGORIES
+# вызываются с символами sympy, производные дифференцируются и компилируются
+# в функции NumPy один раз на узел графа formula_graph. Производные суммарных
+# выбросов по всем входным величинам всех строк считаются обратным проходом
+# по цепочке (как в автоматическом дифференцировании) векторно для всех строк.
+
+from functools import lru_cache
+
+import numpy as np
+
+from formula_graph import NODES, evaluate_chain, plan
+from formulas import find_formula
+
+TARGETS = ("E", "E_CO2")
+
+
+@lru_cache(maxsize=None)
+def node_partials(index):
+    """
+    Частные производные выхода узла NODES[index] по его входам
+    Возвращает: кортеж функций NumPy от входов узла (в порядке node["inputs"])
+    """
+    import sympy as sp
+
+    node = NODES[index]
+    symbols = sp.symbols(node["inputs"])
+    function = find_formula(node["formula"])["function"]
+    if node["output"] == "E":
+        # Слагаемое (1.1) для одной строки - сумма по одному виду топлива
+        expr = function([symbols[0]], [symbols[1]], [symbols[2]])
+    else:
+        expr = function(*symbols)
+    return tuple(
+        sp.lambdify(symbols, sp.diff(expr, symbol), modules="numpy")
+        for symbol in symbols
+    )
+
+
+def analyze(inputs, top=20):
+    """
+    Производные и эластичности суммарных выбросов E_CO2,y по всем входам
+    - inputs: словарь {переменная графа: массив по строкам}, как в evaluate_chain
+    - top: размер рейтинга входных величин по модулю эластичности
+    Возвращает: словарь
+      "total" - E_CO2,y;
+      "emissions" - выбросы по строкам;
+      "derivatives" - {переменная: dE_CO2/dx по строкам};
+      "elasticities" - {переменная: (dE_CO2/dx) * x / E_CO2 по строкам};
+      "contributions" - структурированный массив (row, emission, share, cumulative),
+        отсортированный по убыванию вклада;
+      "ranking" - список (переменная, строка, эластичность) по убыванию модуля
+    """
+    sources = {}
+    values = evaluate_chain(inputs, TARGETS, sources=sources)
+    emissions = values["E"]
+    total = float(values["E_CO2"])
+    n_rows = emissions.shape[0]
+
+    # Обратный проход: adjoint[x] = dE_CO2 / dx по строкам
+    adjoint = {"E": np.ones(n_rows)}
+    for name, nodes in reversed(plan(TARGETS, frozenset(inputs))):
+        if name == "E_CO2" or name not in adjoint:
+            continue
+        upstream = adjoint[name]
+        for position, node in enumerate(nodes):
+            mask = sources[name] == position
+            if not mask.any():
+                continue
+            args = [values[i] for i in node["inputs"]]
+            for inp, partial in zip(node["inputs"], node_partials(NODES.index(node))):
+                term = np.where(mask, upstream * partial(*args), 0.0)
+                adjoint[inp] = adjoint.get(inp, 0.0) + term
+
+    derivatives = {}
+    elasticities = {}
+    for name in inputs:
+        if name not in adjoint:
+            continue
+        derivative = np.broadcast_to(adjoint[name], (n_rows,)).copy()
+        value = np.broadcast_to(values[name], (n_rows,))
+        if name in sources:
+            # Заданное значение используется только в строках без расчёта
+            derivative[sources[name] != -1] = 0.0
+        derivative[np.isnan(value)] = 0.0
+        derivatives[name] = derivative
+        with np.errstate(invalid="ignore", divide="ignore"):
+            elasticity = derivative * np.nan_to_num(value) / total
+        elasticities[name] = np.nan_to_num(elasticity)
+
+    order = np.argsort(-emissions, kind="stable")
+    contributions = np.empty(
+        n_rows,
+        dtype=[
+            ("row", np.int64),
+            ("emission", np.float64),
+            ("share", np.float64),
+            ("cumulative", np.float64),
+        ],
+    )
+    contributions["row"] = order
+    contributions["emission"] = emissions[order]
+    contributions["share"] = contributions["emission"] / total if total else 0.0
+    contributions["cumulative"] = np.cumsum(contributions["share"])
+
+    names = list(elasticities)
+    ranking = []
+    if names:
+        matrix = np.vstack([elasticities[name] for name in names])
+        flat = np.abs(matrix).ravel()
+        k = min(top, flat.size)
+        best = np.argpartition(-flat, k - 1)[:k]
+        best = best[np.argsort(-flat[best], kind="stable")]
+        for index in best:
+            i, row = divmod(int(index), n_rows)
+            ranking.append((names[i], row, float(matrix[i, row])))
+
+    return {
+        "total": total,
+        "emissions": emissions,
+        "derivatives": derivatives,
+        "elasticities": elasticities,
+        "contributions": contributions,
+        "ranking": ranking,
+    }
@@ -0,0 +1,50 @@
+import io
+
+import pytest
+
+from cli import evaluate_row, process, read_rows
+
+
+def test_single_value_list_row():
+    row = {"formula": "(1.1)", "fc_list": "5", "ef_list": "2", "of_list": "1"}
+    assert evaluate_row(row) == pytest.approx(evaluate_row(dict(row, fc_list="5;")))
+
+
+def test_arithmetic_error_becomes_error_row():
+    written = []
+    rows = [
+        {"formula": "(1.2а)", "fc_prime": "120", "k": "1.129"},
+        {
+            "formula": "(1.4)",
+            "w_list": "100",
+            "n_c_list": "1",
+            "m_list": "0",
+            "rho": "0.7",
+        },
+    ]
+    total, errors = process(rows, written.extend)
+    assert (total, errors) == (2, 1)
+    assert written[0][2] == pytest.approx(120 * 1.129)
+    assert written[1][2] is None and written[1][3]
+
+
+def test_malformed_jsonl_lines_become_error_rows():
+    lines = ['{"formula": "(1.5)", "w_c": 0.5}', "{bad", "[1, 2]"]
+    written = []
+    total, errors = process(
+        read_rows(io.StringIO("\n".join(lines)), "jsonl"), written.extend
+    )
+    assert (total, errors) == (3, 2)
+    assert written[0][2] == pytest.approx(1.832)
+    assert [row for _, row, _, _ in written[1:]] == [
+        {"input": "{bad"},
+        {"input": "[1, 2]"},
+    ]
+
+
+def test_strict_mode_writes_completed_rows_before_stopping():
+    written = []
+    rows = [{"formula": "(1.5)", "w_c": "0.5"}, {"formula": "(1.5)", "w_c": "x"}]
+    with pytest.raises(ValueError):
+        process(rows, written.extend, strict=True)
+    assert len(written) == 1
@@ -0,0 +1,14 @@
+import numpy as np
+
+from formula_graph import evaluate_chain
+
+
+def test_several_targets_share_plan():
+    inputs = {"FC": [1.0, 2.0], "EF": [2.0, 3.0], "OF": [1.0, 1.0]}
+    both = evaluate_chain(inputs, targets=("E", "W_C"))
+    alone = evaluate_chain(inputs, targets=("W_C",))
+    np.testing.assert_allclose(both["E"], [2.0, 6.0])
+    np.testing.assert_allclose(both["W_C"], alone["W_C"])
+    reversed_order = evaluate_chain(inputs, targets=("W_C", "E", "E_CO2"))
+    np.testing.assert_allclose(reversed_order["W_C"], alone["W_C"])
+    assert float(reversed_order["E_CO2"]) == 8.0
@@ -0,0 +1,37 @@
+import numpy as np
+
+from meter_ingest import MeterAggregator
+
+
+def totals(chunks, **options):
+    aggregator = MeterAggregator(interval="1h", counter=True, **options)
+    for chunk in chunks:
+        aggregator.add({field: np.array(values) for field, values in chunk.items()})
+    result = aggregator.result()
+    return {name: result[name].sum() for name in result.dtype.names[4:]}
+
+
+def test_duplicate_does_not_drive_counter_difference():
+    chunk = {
+        "time": [
+            "2024-01-01 09:00",
+            "2024-01-01 10:00",
+            "2024-01-01 10:00",
+            "2024-01-01 11:00",
+        ],
+        "value": [90, 100, 0, 110],
+    }
+    result = totals([chunk])
+    assert result["consumption"] == 20
+    assert result["duplicates"] == 1
+
+
+def test_late_reading_does_not_replace_carried_reading():
+    chunks = [
+        {"time": ["2024-01-01 09:00", "2024-01-01 10:00"], "value": [90, 100]},
+        {"time": ["2024-01-01 08:00", "2024-01-01 11:00"], "value": [80, 110]},
+    ]
+    result = totals(chunks)
+    assert result["consumption"] == 20
+    assert result["unordered"] == 1
+    assert result["gaps"] == 0 and result["missing"] == 0
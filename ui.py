@@ -1,12 +1,79 @@
 # ui.py - Интерфейс приложения
 
 import tkinter as tk
+from functools import partial
 from tkinter import ttk, messagebox
-import matplotlib.pyplot as plt
-from io import BytesIO
-from PIL import Image, ImageTk
-from formulas import CATEGORIES
-from data_tables import TABLE_1_1, TABLE_1_2
+from formulas import CATEGORIES, calculate_1_1_batch
+from data_tables import TABLE_1_2
+from fuel_table import FUEL_TABLE
+from latex_cache import LATEX_CACHE
+from fuel_model import FuelListModel
+from fuel_grid import FuelGrid
+from executor import CalculationExecutor
+from result_store import ResultStore
+from units import BASIS, TCE
+from gas_components import COMPOSITION_FORMULAS, GAS_COMPONENTS
+
+# LaTeX-метки блока топлива формулы (1.1): (latex, размер)
+FUEL_LATEX = {
+    "FC": (r"FC_{j,y}", (1.5, 0.5)),
+    "EF": (r"EF_{\text{CO}_2,j,y}", (2, 0.5)),
+    "OF": (r"OF_{j,y}", (1.5, 0.5)),
+}
+
+# Доли компонентов в (1.3), (1.4): списком через запятую или составом "CH4=92.5, ..."
+W_LATEX = r"W_{i,j,y}"
+COMPOSITION_HINT = "или состав: CH4=92.5, C2H6=3.1, N2=4.4 (n_C и M - из справочника)"
+
+
+def read_composition(formula_key, formula, entries):
+    """
+    Состав газа для (1.3)/(1.4), если доли W заданы как "CH4=92.5, ..." или
+    "CH4: 92,5; ..."
+    Возвращает: (состав, {"rho": число} или {"conditions": условия таблицы 1.2})
+    или None, если доли заданы списком
+    """
+    widget = entries.get(W_LATEX)
+    if (
+        formula_key not in COMPOSITION_FORMULAS
+        or widget is None
+        or not any(sep in widget.get() for sep in "=:")
+    ):
+        return None
+    composition = GAS_COMPONENTS.parse(widget.get())
+    rho_latex = next(
+        input_data["var_latex"]
+        for input_data in formula["inputs"][1:]
+        if input_data["var_latex"].startswith(r"\rho")
+    )
+    rho_text = entries[rho_latex].get()
+    if rho_text in TABLE_1_2:
+        return composition, {"conditions": rho_text}
+    return composition, {"rho": float(rho_text.replace(",", "."))}
+
+
+def collect_latex_items():
+    """Все LaTeX-метки интерфейса (формулы и обозначения переменных) с размерами"""
+    items = list(FUEL_LATEX.values())
+    for formulas in CATEGORIES.values():
+        for formula in formulas.values():
+            items.append((formula["latex"], (6, 1)))
+            for input_data in formula["inputs"][1:]:
+                items.append((input_data["var_latex"], (2, 0.5)))
+    return items
+
+
+def calculate_fuels(job, fc, ef, of_val, chunk=100000):
+    """(1.1) по частям списка топлива с передачей прогресса в очередь расчётов"""
+    n_rows = len(fc)
+    total = 0.0
+    for start in range(0, n_rows, chunk):
+        end = min(start + chunk, n_rows)
+        total += calculate_1_1_batch(fc[start:end], ef[start:end], of_val[start:end])[
+            "total"
+        ]
+        job.report(end, n_rows, f"строк: {end}")
+    return total
 
 
 class GHGCalculator:
@@ -72,14 +139,78 @@ class GHGCalculator:
         self.formula_combo.pack(pady=0)
         self.formula_combo.bind("<<ComboboxSelected>>", self.load_formula_ui)
 
+        # Объект и отчётный период для истории результатов
+        record_frame = ttk.Frame(self.main_frame)
+        record_frame.pack(pady=0)
+        ttk.Label(record_frame, text="Объект:", font=("Arial", 10)).pack(side=tk.LEFT)
+        self.facility_entry = ttk.Entry(record_frame, width=30)
+        self.facility_entry.pack(side=tk.LEFT, padx=0)
+        ttk.Label(record_frame, text="Период:", font=("Arial", 10)).pack(side=tk.LEFT)
+        self.period_entry = ttk.Entry(record_frame, width=10)
+        self.period_entry.pack(side=tk.LEFT, padx=0)
+
         ttk.Separator(self.main_frame, orient="horizontal").pack(fill=tk.X, pady=1)
 
+        self.result_store = ResultStore()
+
+        # Строка состояния очереди расчётов
+        self.executor = CalculationExecutor(root, on_status=self.show_status)
+        status_frame = ttk.Frame(self.main_frame)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_label = ttk.Label(status_frame, text="Готово", font=("Arial", 9))
+        self.status_label.pack(side=tk.LEFT)
+        self.cancel_btn = ttk.Button(
+            status_frame,
+            text="Отменить расчёты",
+            command=self.executor.cancel_all,
+            state="disabled",
+        )
+        self.cancel_btn.pack(side=tk.RIGHT)
+
         # Фрейм для контента
         self.content_frame = ttk.Frame(self.main_frame)
         self.content_frame.pack(fill=tk.BOTH, expand=True)
 
         self.input_entries = {}  # Словарь для Entry по var_latex
-        self.fuel_entries = []  # Для (1.1)
+        self.fuel_grid = None  # Для (1.1): таблица строк топлива
+        self.fuel_model = FuelListModel(on_change=self.show_fuel_total)
+        self.result_label = None
+
+        # Фоновый рендеринг всех LaTeX-меток после показа окна
+        self.root.after(100, self.start_latex_prerender)
+
+    def start_latex_prerender(self):
+        self.latex_items = collect_latex_items()
+        self.prerender_thread = LATEX_CACHE.prerender(self.latex_items)
+        self.root.after(200, self.poll_latex_prerender)
+
+    def poll_latex_prerender(self):
+        if self.prerender_thread.is_alive():
+            self.root.after(200, self.poll_latex_prerender)
+        else:
+            self.warm_latex_images(self.latex_items)
+
+    def warm_latex_images(self, items, batch=8):
+        # Декодирование готовых PNG в PhotoImage небольшими порциями между событиями
+        for latex_text, size in items[:batch]:
+            if LATEX_CACHE.has_png(latex_text, size):
+                LATEX_CACHE.get_photo(latex_text, size)
+        if items[batch:]:
+            self.root.after(1, self.warm_latex_images, items[batch:], batch)
+
+    def show_status(self, executor):
+        self.status_label.config(text=executor.status_text())
+        self.cancel_btn.config(state="normal" if executor.busy else "disabled")
+
+    def show_result(self, label, result):
+        # Экран формулы мог смениться, пока расчёт был в очереди
+        if label.winfo_exists():
+            label.config(text=f"Результат: {result:.4f} т CO2")
+
+    def show_error(self, error):
+        messagebox.showerror(
+            "Ошибка", str(error) + ". Используйте точку для десятичных чисел."
+        )
 
     def load_formulas(self, event):
         category = self.category_combo.get()
@@ -128,153 +259,69 @@ class GHGCalculator:
         self.result_label.pack()
 
     def load_1_1_ui(self):
-        # Canvas для скролла
-        canvas = tk.Canvas(self.content_frame, height=450)
-        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar = ttk.Scrollbar(
-            self.content_frame, orient="vertical", command=canvas.yview
-        )
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        fuel_frame = ttk.Frame(canvas)
-        canvas.create_window((0, 0), window=fuel_frame, anchor="nw")
-        fuel_frame.bind(
-            "<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-        canvas.configure(yscrollcommand=scrollbar.set)
-        canvas.bind(
-            "<MouseWheel>",
-            lambda e: canvas.yview_scroll(int(-1 * (e.delta / 120)), "units"),
-        )
-        fuel_frame.bind(
-            "<MouseWheel>",
-            lambda e: canvas.yview_scroll(int(-1 * (e.delta / 120)), "units"),
-        )  # Только на canvas и fuel_frame
-
-        add_btn = ttk.Button(
-            self.content_frame,
-            text="Добавить топливо",
-            command=lambda: self.add_fuel_entry(fuel_frame, canvas),
-        )
-        add_btn.pack(pady=0)
-
-        self.add_fuel_entry(fuel_frame, canvas)
-
-    def add_fuel_entry(self, fuel_frame, canvas):
-        frame = ttk.Frame(fuel_frame, borderwidth=1, relief="solid", padding=3)
-        frame.pack(fill=tk.X, pady=0)
-
-        # Bind скролл к блоку
-        frame.bind(
-            "<MouseWheel>",
-            lambda e: canvas.yview_scroll(int(-1 * (e.delta / 120)), "units"),
-        )
-
-        # Топливо
-        fuel_label = ttk.Label(frame, text="Тип топлива:")
-        fuel_label.grid(row=0, column=0, padx=0, pady=0)
-        fuel_combo = ttk.Combobox(frame, values=list(TABLE_1_1.keys()), width=35)
-        fuel_combo.grid(row=0, column=1, columnspan=2, padx=0, pady=0)
-        fuel_combo.bind(
-            "<<ComboboxSelected>>", lambda e: self.update_fuel_params(frame)
-        )
-
-        # Единицы
-        unit_label = ttk.Label(frame, text="Единицы:")
-        unit_label.grid(row=0, column=3, padx=0, pady=0)
-        unit_combo = ttk.Combobox(frame, values=["т у.т.", "ТДж"], width=10)
-        unit_combo.grid(row=0, column=4, padx=0, pady=0)
-        unit_combo.set("т у.т.")
-        unit_combo.bind(
-            "<<ComboboxSelected>>", lambda e: self.update_fuel_params(frame)
-        )
-
-        # FC
-        fc_label = self.create_latex_label(frame, r"FC_{j,y}", (1.5, 0.5))
-        fc_label.grid(row=1, column=0, padx=0, pady=0)
-        fc_entry = ttk.Entry(frame, width=15)
-        fc_entry.grid(row=1, column=1, padx=0, pady=0)
-        fc_btn = ttk.Button(
-            frame,
-            text="Расчёт FC",
-            command=lambda: self.open_sub_calc(
-                "FC", fc_entry, fuel_combo.get(), unit_combo.get()
-            ),
-        )
-        fc_btn.grid(row=1, column=2, padx=0, pady=0)
-
         fc_info_label = ttk.Label(
-            frame,
+            self.content_frame,
             text="Коэффициенты выбросов CO2 при сжигании топлива (EFCO2,j,y) и коэффициент окисления (OFj,y) рассчитываются на основе фактических данных. Если таких данных нет, используются табличные значения.",
             font=("Arial", 7, "italic"),
             foreground="#666666",
-            wraplength=250,
-        )
-        fc_info_label.grid(row=2, column=0, columnspan=5, padx=0, pady=0)
-
-        # EF
-        ef_label = self.create_latex_label(frame, r"EF_{\text{CO}_2,j,y}", (2, 0.5))
-        ef_label.grid(row=3, column=0, padx=0, pady=0)
-        ef_entry = ttk.Entry(frame, width=15)
-        ef_entry.grid(row=3, column=1, padx=0, pady=0)
-        ef_btn = ttk.Button(
-            frame,
-            text="Расчёт EF",
-            command=lambda: self.open_sub_calc(
-                "EF", ef_entry, fuel_combo.get(), unit_combo.get()
-            ),
+            wraplength=600,
         )
-        ef_btn.grid(row=3, column=2, padx=0, pady=0)
-
-        # OF
-        of_label = self.create_latex_label(frame, r"OF_{j,y}", (1.5, 0.5))
-        of_label.grid(row=4, column=0, padx=0, pady=0)
-        of_entry = ttk.Entry(frame, width=15)
-        of_entry.grid(row=4, column=1, padx=0, pady=0)
-        of_btn = ttk.Button(
-            frame, text="Расчёт OF", command=lambda: self.open_sub_calc("OF", of_entry)
-        )
-        of_btn.grid(row=4, column=2, padx=0, pady=0)
+        fc_info_label.pack(pady=0)
 
-        remove_btn = ttk.Button(
-            frame, text="Удалить", command=lambda: self.remove_fuel_entry(frame)
-        )
-        remove_btn.grid(row=0, column=5, rowspan=5, padx=0, pady=0)
-
-        self.fuel_entries.append(
-            {
-                "fuel_combo": fuel_combo,
-                "unit_combo": unit_combo,
-                "fc_entry": fc_entry,
-                "ef_entry": ef_entry,
-                "of_entry": of_entry,
-                "frame": frame,
-            }
+        add_btn = ttk.Button(
+            self.content_frame, text="Добавить топливо", command=self.add_fuel_entry
         )
+        add_btn.pack(pady=0)
 
-    def remove_fuel_entry(self, frame):
-        self.fuel_entries = [e for e in self.fuel_entries if e["frame"] != frame]
-        frame.destroy()
-
-    def update_fuel_params(self, frame):
-        for entry in self.fuel_entries:
-            if entry["frame"] == frame:
-                fuel = entry["fuel_combo"].get()
-                unit = entry["unit_combo"].get()
-                if fuel in TABLE_1_1:
-                    data = TABLE_1_1[fuel]
-                    ef_key = "EF_TJ" if unit == "ТДж" else "EF"
-                    ef_entry = entry["ef_entry"]
-                    ef_entry.delete(0, tk.END)
-                    ef_entry.insert(0, str(data[ef_key]))
-
-                    of_entry = entry["of_entry"]
-                    of_entry.config(state="normal")
-                    of_entry.delete(0, tk.END)
-                    if data["type"] in ["gas", "liquid"]:
-                        of_entry.insert(0, "1.0")
-                    else:
-                        of_entry.insert(0, "0.98")  # Default for solid
-                break
+        self.fuel_model = FuelListModel(on_change=self.show_fuel_total)
+        self.fuel_grid = FuelGrid(
+            self.content_frame,
+            self.fuel_model,
+            on_fuel_change=self.update_fuel_params,
+            on_sub_calc=self.open_fuel_sub_calc,
+            make_latex_label=self.create_latex_label,
+            header_latex=FUEL_LATEX,
+        )
+        self.fuel_grid.pack(fill=tk.BOTH, expand=True)
+        self.add_fuel_entry()
+
+    def show_fuel_total(self, model, row_id):
+        # Результат (1.1) обновляется при каждом изменении строки топлива
+        if self.result_label is None:
+            return
+        text = f"Результат: {model.total:.4f} т CO2"
+        if model.invalid:
+            text += f" (не заполнено строк: {len(model.invalid)})"
+        self.result_label.config(text=text)
+
+    def add_fuel_entry(self):
+        self.fuel_model.add_row(unit=TCE)
+        self.fuel_grid.scroll_to_end()
+
+    def open_fuel_sub_calc(self, field, row_id):
+        # Результат пишется в строку модели: виджет строки мог быть
+        # перепривязан к другой строке прокруткой, пока открыто окно расчёта
+        def set_value(value):
+            if row_id in self.fuel_model.rows:
+                self.fuel_model.set_value(row_id, field, value)
+                self.fuel_grid.refresh()
+
+        row = self.fuel_model.rows[row_id]
+        if field == "OF":
+            self.open_sub_calc(field, set_value)
+        else:
+            self.open_sub_calc(field, set_value, row["fuel"], row["unit"])
+
+    def update_fuel_params(self, row_id):
+        row = self.fuel_model.rows[row_id]
+        fuel_id = FUEL_TABLE.fuel_id(row["fuel"])
+        if fuel_id >= 0:
+            ef_key = BASIS.get(row["unit"], BASIS[TCE])["EF"]
+            self.fuel_model.set_value(row_id, "EF", FUEL_TABLE.value(ef_key, fuel_id))
+            if FUEL_TABLE.value("type", fuel_id) in ["gas", "liquid"]:
+                self.fuel_model.set_value(row_id, "OF", "1.0")
+            else:
+                self.fuel_model.set_value(row_id, "OF", "0.98")  # Default for solid
 
     def load_generic_ui(self, formula):
         for input_data in formula["inputs"][1:]:  # Пропустить output
@@ -292,54 +339,113 @@ class GHGCalculator:
                 var_frame, text=input_data["description"], font=("Arial", 8)
             )
             desc_label.pack(pady=0)
+            if input_data["var_latex"] == W_LATEX:
+                ttk.Label(
+                    var_frame, text=COMPOSITION_HINT, font=("Arial", 8, "italic")
+                ).pack(pady=0)
             self.input_entries[input_data["var_latex"]] = entry
 
     def clear_content(self):
         for widget in self.content_frame.winfo_children():
             widget.destroy()
         self.input_entries = {}
-        self.fuel_entries = []
+        self.fuel_grid = None
+        self.result_label = None
 
     def calculate(self, formula_key, formula):
+        category = self.category_combo.get()
+        record = {
+            "formula": formula_key,
+            "category": category,
+            "facility": self.facility_entry.get().strip(),
+            "period": self.period_entry.get().strip(),
+        }
         try:
             if formula_key == "(1.1)":
-                fc_list = []
-                ef_list = []
-                of_list = []
-                for e in self.fuel_entries:
-                    fc = float(e["fc_entry"].get())
-                    ef = float(e["ef_entry"].get())
-                    of_val = float(e["of_entry"].get())
-                    unit = e["unit_combo"].get()
-                    fuel = e["fuel_combo"].get()
-                    fc_list.append(fc)
-                    ef_list.append(ef)
-                    of_list.append(of_val)
-                args = [fc_list, ef_list, of_list]
-            else:
-                args = []
-                for input_data in formula["inputs"][1:]:
-                    value_str = (
-                        self.input_entries.get(input_data["var_latex"])
-                        .get()
-                        .replace(",", ".")
+                # Значения уже разобраны моделью при вводе
+                if self.fuel_model.invalid:
+                    raise ValueError(
+                        f"Не заполнены FC, EF или OF в строках топлива: "
+                        f"{len(self.fuel_model.invalid)}"
                     )
-                    if "," in value_str:
-                        args.append([float(x.strip()) for x in value_str.split(",")])
-                    else:
-                        args.append(float(value_str))
-
-            result = formula["function"](*args)
-            self.result_label.config(text=f"Результат: {result:.4f} т CO2")
-        except ValueError as e:
-            messagebox.showerror(
-                "Ошибка", str(e) + ". Используйте точку для десятичных чисел."
+                fc, ef, of_val = self.fuel_model.columns()
+                rows = [self.fuel_model.rows[i] for i in self.fuel_model.order]
+                record["inputs"] = {
+                    "fuels": [row["fuel"] for row in rows],
+                    "units": [row["unit"] for row in rows],
+                    "FC": fc,
+                    "EF": ef,
+                    "OF": of_val,
+                }
+                self.executor.submit(
+                    calculate_fuels,
+                    fc,
+                    ef,
+                    of_val,
+                    name=f"{formula_key}, строк: {len(self.fuel_model)}",
+                    with_job=True,
+                    on_done=partial(self.finish_calculation, self.result_label, record),
+                    on_error=self.show_error,
+                )
+                return
+            composition = read_composition(formula_key, formula, self.input_entries)
+            if composition is not None:
+                # n_C,i и M_i берутся из справочника компонентов
+                composition, density = composition
+                record["inputs"] = {W_LATEX: composition, **density}
+                self.executor.submit(
+                    GAS_COMPONENTS.ef,
+                    formula_key,
+                    composition,
+                    name=formula_key,
+                    on_done=partial(self.finish_calculation, self.result_label, record),
+                    on_error=self.show_error,
+                    **density,
+                )
+                return
+            args = []
+            for input_data in formula["inputs"][1:]:
+                value_str = (
+                    self.input_entries.get(input_data["var_latex"])
+                    .get()
+                    .replace(",", ".")
+                )
+                if "," in value_str:
+                    args.append([float(x.strip()) for x in value_str.split(",")])
+                else:
+                    args.append(float(value_str))
+            record["inputs"] = {
+                input_data["var_latex"]: value
+                for input_data, value in zip(formula["inputs"][1:], args)
+            }
+            self.executor.submit(
+                formula["function"],
+                *args,
+                name=formula_key,
+                on_done=partial(self.finish_calculation, self.result_label, record),
+                on_error=self.show_error,
             )
+        except ValueError as e:
+            self.show_error(e)
+
+    def finish_calculation(self, label, record, result):
+        # Результат сохраняется в историю, даже если экран формулы уже сменился
+        self.result_store.add(output=result, **record)
+        self.show_result(label, result)
+
+    def set_target(self, target, value):
+        # Цель результата расчёта: поле ввода или функция записи значения
+        if callable(target):
+            target(value)
+        else:
+            target.delete(0, tk.END)
+            target.insert(0, str(value))
 
     def open_sub_calc(self, sub_type, target_entry, fuel="", unit=""):
         window = tk.Toplevel(self.root)
         window.title(f"Расчёт {sub_type}")
         window.geometry("500x400")
+        fuel_id = FUEL_TABLE.fuel_id(fuel)
 
         variant_var = tk.StringVar()
         all_variants = {
@@ -347,18 +453,11 @@ class GHGCalculator:
             "EF": ["(1.3)", "(1.4)", "(1.5)"],
             "OF": ["(1.8)", "(1.9)"],
         }[sub_type]
-        variants = (
-            all_variants
-            if sub_type != "FC"
-            else [
-                v
-                for v in all_variants
-                if (unit == "т у.т." and v == "(1.2а)")
-                or (unit == "ТДж" and v == "(1.2б)")
-            ]
-        )
-        if not variants:
-            variants = all_variants  # Fallback
+        # Для FC - формула пересчёта в единицу строки топлива
+        if sub_type == "FC" and unit in BASIS:
+            variants = [BASIS[unit]["formula"]]
+        else:
+            variants = all_variants
         for v in variants:
             radio_frame = ttk.Frame(window)
             radio_frame.pack(anchor=tk.W)
@@ -401,28 +500,26 @@ class GHGCalculator:
                     var_frame, text=input_data["description"], font=("Arial", 8)
                 )
                 desc_label.pack(pady=0)
+                if input_data["var_latex"] == W_LATEX:
+                    ttk.Label(
+                        var_frame, text=COMPOSITION_HINT, font=("Arial", 8, "italic")
+                    ).pack(pady=0)
                 if (
                     input_data["var_latex"] == r"k_{j,y}"
                     and v == "(1.2а)"
-                    and fuel in TABLE_1_1
+                    and fuel_id >= 0
                 ):
-                    entry.insert(0, str(TABLE_1_1[fuel]["k"]))
-                if (
-                    input_data["var_latex"] == r"NCV_{j,y}"
-                    and v == "(1.2б)"
-                    and fuel in TABLE_1_1
-                ):
-                    entry.insert(0, str(TABLE_1_1[fuel]["NCV"]))
-                if input_data["var_latex"] == r"NCV_{j,y}" and fuel in TABLE_1_1:
-                    entry.insert(0, str(TABLE_1_1[fuel]["NCV"]))
+                    entry.insert(0, str(FUEL_TABLE.value("k", fuel_id)))
+                if input_data["var_latex"] == r"NCV_{j,y}" and fuel_id >= 0:
+                    entry.insert(0, str(FUEL_TABLE.value("NCV", fuel_id)))
                 if (
                     input_data["var_latex"] == r"W_{C,j,y}"
                     and sub_type == "EF"
                     and v == "(1.5)"
-                    and fuel in TABLE_1_1
+                    and fuel_id >= 0
                 ):
-                    w_key = "W_TJ" if unit == "ТДж" else "W"
-                    entry.insert(0, str(TABLE_1_1[fuel][w_key]))
+                    w_key = BASIS.get(unit, BASIS[TCE])["W"]
+                    entry.insert(0, str(FUEL_TABLE.value(w_key, fuel_id)))
 
             if sub_type == "EF":
                 w_c_btn = ttk.Button(
@@ -442,6 +539,19 @@ class GHGCalculator:
             try:
                 v = variant_var.get()
                 sub_formula = CATEGORIES["1. Стационарное сжигание топлива"][v]
+                composition = read_composition(v, sub_formula, self.sub_input_entries)
+                if composition is not None:
+                    composition, density = composition
+                    self.executor.submit(
+                        GAS_COMPONENTS.ef,
+                        v,
+                        composition,
+                        name=f"{sub_type} {v}",
+                        on_done=finish_sub,
+                        on_error=self.show_error,
+                        **density,
+                    )
+                    return
                 args = []
                 for input_data in sub_formula["inputs"][1:]:
                     widget = self.sub_input_entries.get(input_data["var_latex"])
@@ -457,15 +567,23 @@ class GHGCalculator:
                         args.append([float(x.strip()) for x in value_str.split(",")])
                     else:
                         args.append(float(value_str or "0"))
-                result = sub_formula["function"](*args)
-                target_entry.delete(0, tk.END)
-                target_entry.insert(0, str(result))
-                window.destroy()
+                self.executor.submit(
+                    sub_formula["function"],
+                    *args,
+                    name=f"{sub_type} {v}",
+                    on_done=finish_sub,
+                    on_error=self.show_error,
+                )
             except ValueError as e:
                 messagebox.showerror(
                     "Ошибка", str(e) + ". Используйте точку для десятичных."
                 )
 
+        def finish_sub(result):
+            self.set_target(target_entry, result)
+            if window.winfo_exists():
+                window.destroy()
+
         variant_var.trace("w", update_sub_ui)
         variant_var.set(variants[0])
         update_sub_ui(None, None, None)  # Инициализация
@@ -528,8 +646,7 @@ class GHGCalculator:
                         args.append(float(value_str))
                     result = sub_formula["function"](*args)
                     if target_entry:
-                        target_entry.delete(0, tk.END)
-                        target_entry.insert(0, str(result))
+                        self.set_target(target_entry, result)
                     window.destroy()
                 except ValueError as e:
                     messagebox.showerror(
@@ -542,19 +659,9 @@ class GHGCalculator:
 
     def create_latex_label(self, parent, latex_text, size=(6, 1)):
         try:
-            fig, ax = plt.subplots(figsize=size)
-            ax.text(0.5, 0.5, f"${latex_text}$", fontsize=12, ha="center", va="center")
-            ax.axis("off")
-            buffer = BytesIO()
-            plt.savefig(
-                buffer, format="png", bbox_inches="tight", dpi=150, transparent=True
-            )
-            buffer.seek(0)
-            img = Image.open(buffer)
-            photo = ImageTk.PhotoImage(img)
+            photo = LATEX_CACHE.get_photo(latex_text, size)
             label = ttk.Label(parent, image=photo)
             label.image = photo
-            plt.close(fig)
             return label
         except Exception as e:
             print(f"Ошибка рендеринга LaTeX: {e}")
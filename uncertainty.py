@@ -0,0 +1,205 @@
+# uncertainty.py - Оценка неопределённости выбросов от стационарного сжигания методом Монте-Карло
+
+# Входные величины графа формул (FC, EF, OF или исходные FC', k, W_C, q4 и т.д.)
+# задаются средними значениями по видам топлива и относительной неопределённостью
+# (половина 95%-го интервала в долях от среднего). Выборки строятся векторно
+# и проходят через цепочку формул formula_graph до (1.1). Расчёт ведётся блоками
+# видов топлива и порциями выборок, поэтому память ограничена max_elements
+# значениями на массив независимо от числа видов топлива; блоки можно считать
+# в отдельных процессах, результат не зависит от числа процессов.
+
+import numpy as np
+
+from formula_graph import evaluate_chain
+from fuel_table import FUEL_TABLE, TYPE_CODES
+
+Z_95 = 1.959964
+DISTRIBUTIONS = ("normal", "lognormal", "uniform")
+
+# Допустимые диапазоны величин (по умолчанию - неотрицательные значения).
+# Распределения усекаются: выборки за пределами диапазона разыгрываются заново,
+# а не обрезаются до границы, поэтому у границы (OF около 1) не возникает
+# скопления значений, равных пределу
+BOUNDS = {"OF": (0.0, 1.0)}
+MAX_REDRAWS = 100  # Наибольшее число повторных розыгрышей выборок вне диапазона
+
+
+def table_inputs(fuels, unit="т у.т."):
+    """
+    Средние EF и OF по умолчанию из таблицы 1.1 (как в интерфейсе: OF = 1.0 для
+    газообразного и жидкого топлива, 0.98 для твёрдого)
+    - fuels: названия видов топлива
+    - unit: "т у.т." или "ТДж" (выбор EF или EF_TJ)
+    Возвращает: словарь {"EF": массив, "OF": массив}
+    """
+    ids = FUEL_TABLE.fuel_ids(fuels)
+    ef = FUEL_TABLE.gather("EF_TJ" if unit == "ТДж" else "EF", ids)
+    solid = FUEL_TABLE.gather("type", ids) == TYPE_CODES.index("solid")
+    return {"EF": ef, "OF": np.where(solid, 0.98, 1.0)}
+
+
+def sample(rng, mean, rel_uncertainty, size, distribution="normal"):
+    """
+    Выборки величины для блока видов топлива
+    - mean, rel_uncertainty: массивы формы (блок, 1)
+    - size: (блок, число выборок)
+    """
+    if distribution == "normal":
+        return rng.normal(mean, np.abs(mean) * rel_uncertainty / Z_95, size)
+    if distribution == "lognormal":
+        sigma = np.log1p(rel_uncertainty) / Z_95
+        return mean * rng.lognormal(-0.5 * sigma**2, sigma, size)
+    if distribution == "uniform":
+        half = np.abs(mean) * rel_uncertainty
+        return rng.uniform(mean - half, mean + half, size)
+    raise ValueError(f"Неизвестное распределение: {distribution}")
+
+
+def sample_bounded(rng, mean, rel_uncertainty, size, distribution, low, high):
+    """
+    Выборки усечённого распределения: значения вне [low, high] разыгрываются
+    заново (только они) до попадания в диапазон
+    """
+    values = sample(rng, mean, rel_uncertainty, size, distribution)
+    mean = np.broadcast_to(mean, size)
+    rel_uncertainty = np.broadcast_to(rel_uncertainty, size)
+    for _ in range(MAX_REDRAWS):
+        outside = np.nonzero((values < low) | (values > high))
+        if not outside[0].size:
+            return values
+        values[outside] = sample(
+            rng,
+            mean[outside],
+            rel_uncertainty[outside],
+            outside[0].size,
+            distribution,
+        )
+    raise ValueError(
+        f"Распределение почти целиком вне диапазона [{low}, {high}]: "
+        f"проверьте среднее и неопределённость"
+    )
+
+
+def _simulate_block(task):
+    """Расчёт блока видов топлива (выполняется и в рабочих процессах)"""
+    means, uncertainties, distributions, n_draws, chunk, seed, quantiles = task
+    rng = np.random.default_rng(seed)
+    n_fuels = len(next(iter(means.values())))
+    emissions = np.empty((n_fuels, n_draws))
+    for start in range(0, n_draws, chunk):
+        size = (n_fuels, min(chunk, n_draws - start))
+        inputs = {}
+        for name, mean in means.items():
+            mean = mean[:, None]
+            u = uncertainties.get(name)
+            if u is None:
+                inputs[name] = mean
+                continue
+            low, high = BOUNDS.get(name, (0.0, np.inf))
+            inputs[name] = sample_bounded(
+                rng, mean, u[:, None], size, distributions.get(name), low, high
+            )
+        inputs = {k: np.broadcast_to(v, size) for k, v in inputs.items()}
+        emissions[:, start : start + size[1]] = evaluate_chain(inputs, ("E",))["E"]
+    return (
+        emissions.mean(axis=1),
+        np.quantile(emissions, quantiles, axis=1),
+        emissions.sum(axis=0),
+    )
+
+
+def monte_carlo(
+    means,
+    rel_uncertainty,
+    n_draws=100000,
+    confidence=0.95,
+    distributions=None,
+    max_elements=2000000,
+    workers=1,
+    seed=0,
+):
+    """
+    Доверительные интервалы выбросов CO2 по видам топлива и в сумме
+    - means: словарь {переменная графа формул: среднее по видам топлива}
+    - rel_uncertainty: словарь {переменная: относительная неопределённость (95%)},
+      число или массив по видам топлива; переменные без неопределённости
+      считаются точными
+    - n_draws: число выборок
+    - confidence: уровень доверия интервалов
+    - distributions: словарь {переменная: "normal" | "lognormal" | "uniform"}
+    - max_elements: наибольший размер массива выборок одного блока
+    - workers: число процессов (1 - без пула)
+    - seed: начальное значение генератора (результат воспроизводим)
+    Возвращает: словарь {"fuels": {"mean", "lower", "upper"}, "total": {...}}
+    """
+    distributions = distributions or {}
+    for name, distribution in distributions.items():
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Неизвестное распределение для {name}: {distribution}")
+    arrays = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in means.values())
+    )
+    means = {name: np.ascontiguousarray(a) for name, a in zip(means, arrays)}
+    n_fuels = len(arrays[0])
+    uncertainties = {
+        name: np.broadcast_to(np.asarray(u, dtype=np.float64), (n_fuels,)).copy()
+        for name, u in rel_uncertainty.items()
+    }
+    unknown = set(uncertainties) - set(means)
+    if unknown:
+        raise ValueError(f"Неопределённость без среднего: {', '.join(unknown)}")
+    distributions = {name: distributions.get(name, "normal") for name in uncertainties}
+
+    # Блок видов топлива хранит все выборки своих выбросов (для квантилей)
+    block = max(1, min(n_fuels, max_elements // n_draws))
+    chunk = max(1, min(n_draws, max_elements // block))
+    alpha = (1 - confidence) / 2
+    quantiles = np.array([alpha, 1 - alpha])
+    starts = range(0, n_fuels, block)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    tasks = [
+        (
+            {name: m[i : i + block] for name, m in means.items()},
+            {name: u[i : i + block] for name, u in uncertainties.items()},
+            distributions,
+            n_draws,
+            chunk,
+            s,
+            quantiles,
+        )
+        for i, s in zip(starts, seeds)
+    ]
+    pool = None
+    if workers == 1 or len(tasks) == 1:
+        results = map(_simulate_block, tasks)
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        context = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(workers, mp_context=context)
+        results = pool.map(_simulate_block, tasks)
+
+    fuel_mean, fuel_bounds, total = [], [], np.zeros(n_draws)
+    try:
+        for mean, bounds, partial_total in results:
+            fuel_mean.append(mean)
+            fuel_bounds.append(bounds)
+            total += partial_total
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    fuel_bounds = np.concatenate(fuel_bounds, axis=1)
+    total_bounds = np.quantile(total, quantiles)
+    return {
+        "fuels": {
+            "mean": np.concatenate(fuel_mean),
+            "lower": fuel_bounds[0],
+            "upper": fuel_bounds[1],
+        },
+        "total": {
+            "mean": float(total.mean()),
+            "lower": float(total_bounds[0]),
+            "upper": float(total_bounds[1]),
+        },
+    }
@@ -0,0 +1,166 @@
+# units.py - Пересчёт расхода топлива между натуральными единицами, т у.т. и ТДж
+
+# Множители пересчёта строятся один раз из TABLE_1_1 (через FUEL_TABLE): для
+# каждой единицы и каждого вида топлива - количество единицы в одной натуральной
+# единице топлива: т у.т. - k (формула (1.2а)), ТДж - NCV * 10^-3 (формула
+# (1.2б)), натуральная единица - 1 (т для жидкого и твёрдого топлива, тыс. м3 для
+# газообразного). Пересчёт столбца FC - одна выборка множителей по кодам единиц и
+# идентификаторам топлива и одно деление с умножением для всех строк.
+# Несовместимые пары (тыс. м3 для твёрдого топлива, неизвестная единица или
+# топливо) дают NaN в множителе и отклоняются одной проверкой для всего столбца.
+
+import numpy as np
+
+from fuel_table import FUEL_TABLE, TYPE_CODES
+from rollup import factorize
+
+TCE = "т у.т."
+TJ = "ТДж"
+TONNE = "т"
+THOUSAND_M3 = "тыс. м3"
+UNITS = (TCE, TJ, TONNE, THOUSAND_M3)
+
+# Натуральная единица по типу топлива (TYPE_CODES)
+NATURAL_UNITS = {"gas": THOUSAND_M3, "liquid": TONNE, "solid": TONNE}
+
+# Единицы, в которых задаётся FC_j,y в (1.1): столбцы коэффициентов TABLE_1_1 и
+# формула пересчёта из натуральных единиц
+BASIS = {
+    TCE: {"EF": "EF", "W": "W", "formula": "(1.2а)"},
+    TJ: {"EF": "EF_TJ", "W": "W_TJ", "formula": "(1.2б)"},
+}
+
+# Другие написания единиц
+ALIASES = {
+    "ту.т.": TCE,
+    "т у. т.": TCE,
+    "тут": TCE,
+    "tce": TCE,
+    "tj": TJ,
+    "тдж": TJ,
+    "t": TONNE,
+    "тонн": TONNE,
+    "тыс.м3": THOUSAND_M3,
+    "тыс. м³": THOUSAND_M3,
+    "тыс.м³": THOUSAND_M3,
+}
+
+
+def normalize_unit(unit):
+    """Единица из UNITS по написанию пользователя; None, если единица неизвестна"""
+    unit = " ".join(str(unit).split())
+    if unit in UNITS:
+        return unit
+    return ALIASES.get(unit.lower(), ALIASES.get(unit))
+
+
+class UnitConverter:
+    """
+    Пересчёт столбцов расхода топлива между единицами
+    - fuel_table: FuelTable с коэффициентами k и NCV
+    """
+
+    def __init__(self, fuel_table=FUEL_TABLE):
+        self.fuel_table = fuel_table
+        self.unit_ids = {unit: i for i, unit in enumerate(UNITS)}
+        k = fuel_table.columns["k"]
+        ncv = fuel_table.columns["NCV"]
+        types = np.array(TYPE_CODES)[fuel_table.type_code]
+        per_natural = np.full((len(UNITS), len(fuel_table)), np.nan)
+        per_natural[self.unit_ids[TCE]] = np.where(k > 0, k, np.nan)
+        per_natural[self.unit_ids[TJ]] = np.where(ncv > 0, ncv * 0.001, np.nan)
+        for unit in (TONNE, THOUSAND_M3):
+            natural = np.array([NATURAL_UNITS[t] == unit for t in types.tolist()])
+            per_natural[self.unit_ids[unit], natural] = 1.0
+        # Последний столбец - для неизвестного топлива (идентификатор -1)
+        self.per_natural = np.hstack([per_natural, np.full((len(UNITS), 1), np.nan)])
+        self.per_natural.flags.writeable = False
+
+    def natural_unit(self, fuel):
+        """Натуральная единица топлива (название или идентификатор)"""
+        fuel_id = fuel if isinstance(fuel, (int, np.integer)) else None
+        if fuel_id is None:
+            fuel_id = self.fuel_table.fuel_id(fuel)
+        if fuel_id < 0:
+            raise ValueError(f"Неизвестный вид топлива: {fuel}")
+        return NATURAL_UNITS[self.fuel_table.value("type", fuel_id)]
+
+    def unit_codes(self, units):
+        """
+        Коды единиц для массива написаний (поиск только по различным значениям)
+        Возвращает: массив int8, -1 для неизвестных единиц
+        """
+        units = np.asarray(units)
+        inverse, labels = factorize(units.astype(str))
+        codes = np.array(
+            [self.unit_ids.get(normalize_unit(label), -1) for label in labels.tolist()],
+            dtype=np.int8,
+        )
+        return codes[inverse].reshape(units.shape)
+
+    def _fuel_ids(self, fuels):
+        fuels = np.asarray(fuels)
+        if fuels.dtype.kind in "iu":
+            ids = fuels.astype(np.int64)
+            ids[(ids < 0) | (ids >= len(self.fuel_table))] = -1
+            return ids
+        return self.fuel_table.fuel_ids(fuels).astype(np.int64)
+
+    def factors(self, fuels, from_units, to_units):
+        """
+        Множители пересчёта для каждой строки
+        - fuels: названия или идентификаторы топлива (массив)
+        - from_units, to_units: единицы строк или одна единица для всех
+        Возвращает: массив множителей; NaN для несовместимых строк
+        """
+        ids = self._fuel_ids(fuels)
+        source = self.unit_codes(from_units)
+        target = self.unit_codes(to_units)
+        ids, source, target = np.broadcast_arrays(ids, source, target)
+        # Неизвестное топливо (-1) выбирает последний столбец множителей (NaN)
+        result = (
+            self.per_natural[np.maximum(target, 0), ids]
+            / self.per_natural[np.maximum(source, 0), ids]
+        )
+        return np.where((source < 0) | (target < 0), np.nan, result)
+
+    def convert(self, values, fuels, from_units, to_units=TCE, errors="raise"):
+        """
+        Пересчёт столбца расхода топлива
+        - values: значения в единицах from_units
+        - fuels: вид топлива каждой строки (названия или идентификаторы)
+        - from_units: единица каждой строки (смешанные единицы допускаются)
+        - to_units: целевая единица (или единицы по строкам)
+        - errors: "raise" - ValueError со списком несовместимых строк,
+          "nan" - NaN в таких строках
+        Возвращает: массив значений в to_units
+        """
+        values = np.asarray(values, dtype=np.float64)
+        factors = self.factors(fuels, from_units, to_units)
+        result = values * factors
+        if errors == "raise":
+            bad = np.isnan(factors)
+            if bad.any():
+                rows = np.flatnonzero(bad.ravel())
+                raise ValueError(
+                    f"Несовместимые единицы или неизвестное топливо в строках "
+                    f"({len(rows)}): {', '.join(map(str, rows[:10]))}"
+                )
+        elif errors != "nan":
+            raise ValueError(f"Неизвестный режим обработки ошибок: {errors}")
+        return result
+
+    def prepare_1_1(self, values, fuels, units, basis=TCE):
+        """
+        FC_j,y и EF_CO2,j,y для пакетного (1.1) из расхода в смешанных единицах
+        - basis: единица FC в (1.1), т у.т. или ТДж (определяет столбец EF)
+        Возвращает: (FC в basis, EF из TABLE_1_1) для calculate_1_1_batch
+        """
+        if basis not in BASIS:
+            raise ValueError(f"Единица FC для (1.1) - {TCE} или {TJ}")
+        fc = self.convert(values, fuels, units, basis)
+        ef = self.fuel_table.gather(BASIS[basis]["EF"], self._fuel_ids(fuels))
+        return fc, np.broadcast_to(ef, fc.shape)
+
+
+UNIT_CONVERTER = UnitConverter()